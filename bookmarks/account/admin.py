@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Profile
+from .models import AccountDeletion, Profile
 
 
 # Registers models for the account application
@@ -8,3 +8,9 @@ from .models import Profile
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ["user", "date_of_birth", "photo"]
     raw_id_fields = ["user"]
+
+
+@admin.register(AccountDeletion)
+class AccountDeletionAdmin(admin.ModelAdmin):
+    list_display = ["user", "requested"]
+    raw_id_fields = ["user"]
@@ -1,20 +1,78 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import router
+from django.db.models.functions import Lower
 
+from .lookups import db_lower
 from .models import Profile
 
+# unknown e-mail addresses are remembered for a short time, so repeated attempts with
+# them don't reach the database
+UNKNOWN_EMAIL_KEY = "auth:unknown-email:{}"
+
+
+def normalize_email(email, using=None):
+    """normalize_email returns the form of an e-mail address used for lookups: without
+    surrounding spaces, and lowercased like LOWER(email) in the auth_user email index,
+    see account.lookups.
+
+    Args:
+        email (string): the address
+        using (string, optional): alias of the database. Defaults to the one users are
+        read from.
+
+    Returns:
+        string: the normalized address
+    """
+    return db_lower(email.strip(), using or router.db_for_read(User))
+
+
+def unknown_email_key(email):
+    """unknown_email_key returns the cache key that marks an e-mail address as unknown.
+    The address is hashed, so arbitrary login input is never used as a key.
+    """
+    digest = hashlib.sha256(normalize_email(email).encode()).hexdigest()
+    return UNKNOWN_EMAIL_KEY.format(digest)
+
+
+def get_users_by_email(email):
+    """get_users_by_email builds the QuerySet of users with the given e-mail address,
+    ignoring case. It uses the LOWER(email) index of auth_user.
+    """
+    users = User.objects.all()
+    return users.alias(email_lower=Lower("email")).filter(
+        email_lower=normalize_email(email, users.db)
+    )
+
 
 # authentication backend
 class EmailAuthBackend:
-    """Authenticate using an e-mail address."""
+    """Authenticate using an e-mail address, ignoring case. Identifiers that are not
+    e-mail addresses are left to ModelBackend without a query, addresses shared by
+    several accounts never authenticate, and unknown addresses are cached for
+    EMAIL_AUTH_NEGATIVE_TIMEOUT seconds.
+    """
 
     def authenticate(self, request, username=None, password=None):
-        try:
-            user = User.objects.get(email=username)
-            if user.check_password(password):
-                return user
+        if not username or "@" not in username or password is None:
+            return None
+        key = unknown_email_key(username)
+        if cache.get(key):
+            return None
+        users = list(get_users_by_email(username)[:2])
+        if not users:
+            cache.set(key, True, settings.EMAIL_AUTH_NEGATIVE_TIMEOUT)
             return None
-        except (User.DoesNotExist, User.MultipleObjectsReturned):
+        if len(users) > 1:
+            # the address doesn't identify a single account
             return None
+        user = users[0]
+        if user.check_password(password):
+            return user
+        return None
 
     def get_user(self, user_id):
         try:
@@ -0,0 +1,24 @@
+from functools import wraps
+
+from django.contrib.auth.views import redirect_to_login
+
+
+def alogin_required(view_func):
+    """alogin_required is login_required for async views, which it doesn't support
+    before Django 5.1. Anonymous users are redirected to LOGIN_URL.
+
+    Args:
+        view_func (coroutine function): the async view
+
+    Returns:
+        coroutine function: the view, for logged-in users only
+    """
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,181 @@
+"""
+Deletion of accounts in the background.
+
+Deleting a User cascades to their images, likes, follows and actions in a single
+transaction, and users_like_changed saves every image they liked, so deleting an active
+account locks the tables for as long as all of that takes. request_deletion instead
+disables the account at once, which logs it out of every session and hides it from the
+people directory and the activity stream, and queues it with an AccountDeletion. The
+delete_accounts management command then runs delete_account, which deletes what the
+account owns in batches of bounded size, each in its own short transaction, and the user
+last, whose own cascade is then cheap.
+
+The likes of the user are deleted from the through table of Image.users_like, which
+sends no signal, and the total_likes of the images they liked are recomputed with one
+UPDATE per batch. Actions targeting the user or their images, which the generic relation
+doesn't cascade to, are deleted too, as are the view counts, ranking entries and similar
+images of their images in Redis, and their suggestions.
+"""
+
+import time
+
+from actions.models import Action
+from bookmarks.cache import bump_version
+from bookmarks.redis_pool import r
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from images.models import Image
+from images.recommendations import SIMILAR_KEY
+
+from .models import AccountDeletion, Contact
+from .suggestions import SUGGESTIONS_KEY
+
+# rows deleted per transaction
+BATCH_SIZE = 500
+
+Like = Image.users_like.through
+
+
+def request_deletion(user):
+    """request_deletion disables an account and queues it for deletion.
+
+    Args:
+        user (object): User instance of the account
+    """
+    with transaction.atomic():
+        user.is_active = False
+        # user_changed drops the cached user, which logs out all of their sessions
+        user.save(update_fields=["is_active"])
+        AccountDeletion.objects.get_or_create(user=user)
+
+
+def count_likes(image_ids):
+    """count_likes recomputes the total_likes of images with a single UPDATE. Their
+    versions are bumped once the transaction commits, so a batch that is rolled back
+    leaves the cached fragments of its images alone.
+    """
+    likes = (
+        Like.objects.filter(image_id=OuterRef("pk"))
+        .values("image_id")
+        .annotate(count=Count("*"))
+        .values("count")
+    )
+    Image.objects.filter(pk__in=image_ids).update(
+        total_likes=Coalesce(Subquery(likes), 0)
+    )
+
+    def bump_versions():
+        for image_id in image_ids:
+            bump_version("image", image_id)
+
+    transaction.on_commit(bump_versions)
+
+
+def forget_images(image_ids):
+    """forget_images deletes the view counts, ranking entries and similar images of
+    deleted images from Redis.
+    """
+    pipeline = r.pipeline(transaction=False)
+    pipeline.zrem("image_ranking", *image_ids)
+    for image_id in image_ids:
+        pipeline.delete(f"image:{image_id}:views", SIMILAR_KEY.format(image_id))
+    pipeline.execute()
+
+
+def delete_likes(ids):
+    """delete_likes deletes likes, and recounts the likes of their images."""
+    likes = Like.objects.filter(pk__in=ids)
+    image_ids = set(likes.values_list("image_id", flat=True))
+    likes.delete()
+    count_likes(image_ids)
+
+
+def delete_images(ids):
+    """delete_images deletes images, with the actions targeting them."""
+    image_ct = ContentType.objects.get_for_model(Image)
+    Action.objects.filter(target_ct=image_ct, target_id__in=ids).delete()
+    # also deletes the likes of the images, without signals
+    Image.objects.filter(pk__in=ids).delete()
+    # last, so the batch is rolled back if Redis is unavailable
+    forget_images(ids)
+
+
+def delete_in_batches(queryset, delete_batch=None, batch_size=BATCH_SIZE, pause=0):
+    """delete_in_batches deletes the rows of a QuerySet by batches of primary keys,
+    each in its own transaction.
+
+    Args:
+        queryset (QuerySet): rows to delete
+        delete_batch (callable, optional): deletes the rows with the given primary
+            keys. Defaults to deleting them from queryset.
+        batch_size (int, optional): rows per batch. Defaults to BATCH_SIZE.
+        pause (float, optional): seconds to sleep between batches, to leave room for
+            other writers. Defaults to 0.
+
+    Yields:
+        tuple: rows of every batch, and the seconds its transaction took
+    """
+    last_pk = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        started = time.perf_counter()
+        with transaction.atomic():
+            if delete_batch is None:
+                queryset.filter(pk__in=ids).delete()
+            else:
+                delete_batch(ids)
+        yield len(ids), time.perf_counter() - started
+        last_pk = ids[-1]
+        if pause:
+            time.sleep(pause)
+
+
+def delete_account(user, batch_size=BATCH_SIZE, pause=0):
+    """delete_account deletes a disabled account and everything it owns, in batches.
+    It can be interrupted, and run again.
+
+    Args:
+        user (object): User instance of the account
+        batch_size (int, optional): rows per batch. Defaults to BATCH_SIZE.
+        pause (float, optional): seconds to sleep between batches. Defaults to 0.
+
+    Yields:
+        tuple: what every batch deleted, its rows, and the seconds its transaction took
+    """
+    user_ct = ContentType.objects.get_for_model(user)
+    stages = [
+        ("likes", Like.objects.filter(user_id=user.id), delete_likes),
+        ("images", Image.objects.filter(user_id=user.id), delete_images),
+        ("actions", Action.objects.filter(user_id=user.id), None),
+        (
+            "actions on the user",
+            Action.objects.filter(target_ct=user_ct, target_id=user.id),
+            None,
+        ),
+        # contact_deleted updates the counts and suggestions of the other users
+        (
+            "follows",
+            Contact.objects.filter(Q(user_from_id=user.id) | Q(user_to_id=user.id)),
+            None,
+        ),
+    ]
+    for stage, queryset, delete_batch in stages:
+        for rows, seconds in delete_in_batches(
+            queryset, delete_batch, batch_size, pause
+        ):
+            yield stage, rows, seconds
+    user_id = user.id
+    started = time.perf_counter()
+    with transaction.atomic():
+        # the profile and the AccountDeletion are left
+        user.delete()
+        r.delete(SUGGESTIONS_KEY.format(user_id))
+    yield "user", 1, time.perf_counter() - started
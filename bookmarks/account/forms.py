@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth import get_user_model
 
+from .authentication import get_users_by_email
 from .models import Profile
 
 # adding this to prevent ImportError in clean_email methods
@@ -52,7 +53,8 @@ class UserRegistrationForm(forms.ModelForm):
     def clean_email(self):
         """clean_email validates the email field, preventing users from registering with
         an existing email address. Builds a QuerySet to look for existing users with the
-        email address. Checks for results with exists() method, returning True if found.
+        email address, ignoring case like EmailAuthBackend does. Checks for results with
+        exists() method, returning True if found.
 
         Raises:
             forms.ValidationError: if email address is already in use
@@ -61,7 +63,7 @@ class UserRegistrationForm(forms.ModelForm):
             data (email): returns the email if valid, an error message if invalid
         """
         data = self.cleaned_data["email"]
-        if User.objects.filter(email=data).exists():
+        if get_users_by_email(data).exists():
             raise forms.ValidationError("Email address already in use")
         return data
 
@@ -83,7 +85,7 @@ class UserEditForm(forms.ModelForm):
 
     def clean_email(self):
         data = self.cleaned_data["email"]
-        qs = User.objects.exclude(id=self.instance.id).filter(email=data)
+        qs = get_users_by_email(data).exclude(id=self.instance.id)
         if qs.exists():
             raise forms.ValidationError("Email already in use.")
         return data
@@ -0,0 +1,29 @@
+"""
+Case-insensitive lookups on the LOWER() expression indexes of auth_user.
+
+The user search and the e-mail logins compare LOWER(column) with a value lowercased in
+Python, so the value has to be lowercased the way the database does it. PostgreSQL and
+MySQL fold every letter, but SQLite only folds ASCII letters: there, "Élodie" stays
+"Élodie", and a value folded with str.lower() would never match it.
+"""
+
+import string
+
+from django.db import connections
+
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def db_lower(value, using):
+    """db_lower lowercases a string like LOWER() does on a database.
+
+    Args:
+        value (string): the string to lowercase
+        using (string): alias of the database
+
+    Returns:
+        string: the lowercased string
+    """
+    if connections[using].vendor == "sqlite":
+        return value.translate(ASCII_LOWER)
+    return value.lower()
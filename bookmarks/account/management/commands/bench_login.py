@@ -0,0 +1,140 @@
+# account/management/commands/bench_login.py
+
+import random
+import time
+from importlib import import_module
+
+from account.models import Profile
+from bookmarks.benchmark import format_header, format_row, measure, test_database
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth import login as auth_login
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark login latency of the authentication backends against a throwaway "
+        "database filled with users"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=1_000_000,
+            help="Users created in the test database (default: 1000000)",
+        )
+        parser.add_argument(
+            "--calls",
+            type=int,
+            default=1000,
+            help="Login attempts per benchmark (default: 1000)",
+        )
+        parser.add_argument(
+            "--scan-calls",
+            type=int,
+            default=20,
+            help="Calls of the unindexed email lookup, for comparison (default: 20)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10_000,
+            help="Users inserted at a time (default: 10000)",
+        )
+
+    def handle(self, *args, **options):
+        # password hashing would hide the cost of the lookups being measured
+        with test_database(), override_settings(
+            PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"]
+        ):
+            self.create_users(options["users"], options["batch_size"])
+            cache.clear()
+            self.run(options["users"], options["calls"], options["scan_calls"])
+        self.stdout.write(self.style.SUCCESS("Successfully benchmarked logins"))
+
+    def create_users(self, count, batch_size):
+        User = get_user_model()
+        password = make_password("password")
+        now = timezone.now()
+        columns = [
+            "password",
+            "is_superuser",
+            "username",
+            "first_name",
+            "last_name",
+            "email",
+            "is_staff",
+            "is_active",
+            "date_joined",
+        ]
+        # rows are inserted with plain SQL; building a million model instances would
+        # take longer than the benchmark itself
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            User._meta.db_table, ", ".join(columns), ", ".join(["%s"] * len(columns))
+        )
+        started = time.perf_counter()
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, count, batch_size):
+                cursor.executemany(
+                    sql,
+                    [
+                        # mixed case, which logins must match whatever case is typed
+                        (password, False, f"user{i}", "", "", f"User{i}@Example.com")
+                        + (False, True, now)
+                        for i in range(start, min(start + batch_size, count))
+                    ],
+                )
+            cursor.execute(
+                "INSERT INTO {} (user_id, photo, followers_count, following_count, "
+                "images_count) SELECT id, '', 0, 0, 0 FROM {}".format(
+                    Profile._meta.db_table, User._meta.db_table
+                )
+            )
+        self.stdout.write(
+            f"{count} users created in {time.perf_counter() - started:.1f}s"
+        )
+
+    def run(self, users, calls, scan_calls):
+        User = get_user_model()
+        known = [f"user{random.randrange(users)}@example.com" for _ in range(calls)]
+        unknown = [f"nobody{i}@example.com" for i in range(calls)]
+        # credential stuffing retries the same lists of addresses
+        retried = [unknown[i % 100] for i in range(calls)]
+
+        def login(username, password):
+            return authenticate(None, username=username, password=password)
+
+        SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+
+        def session_login(username):
+            # what the login view does: authenticate, then start a session, which
+            # updates last_login
+            request = RequestFactory().post("/account/login/")
+            request.session = SessionStore()
+            auth_login(request, login(username, "password"))
+
+        benchmarks = [
+            ("email login", login, [(email, "password") for email in known]),
+            ("session login", session_login, [(email,) for email in known]),
+            ("email, wrong password", login, [(email, "wrong") for email in known]),
+            ("unknown email", login, [(email, "password") for email in unknown]),
+            # mostly in the negative cache
+            ("unknown email, retried", login, [(e, "password") for e in retried]),
+            ("unknown username", login, [(f"nobody{i}", "pw") for i in range(calls)]),
+            (
+                "unindexed email lookup",
+                lambda email: User.objects.filter(email=email).first(),
+                [(email,) for email in unknown[:scan_calls]],
+            ),
+        ]
+        self.stdout.write(format_header())
+        for name, func, args_list in benchmarks:
+            self.stdout.write(format_row(name, measure(func, args_list)))
@@ -0,0 +1,94 @@
+# account/management/commands/bench_sessions.py
+
+from importlib import import_module
+
+from bookmarks.benchmark import (
+    fake_redis,
+    format_header,
+    format_row,
+    measure,
+    test_database,
+)
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+ENGINES = [
+    ("db", "django.contrib.sessions.backends.db"),
+    ("redis", "bookmarks.redis_sessions"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the overhead of sessions on every request, with the database and "
+        "the Redis session engines"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--calls",
+            type=int,
+            default=2000,
+            help="Calls per benchmark (default: 2000)",
+        )
+        parser.add_argument(
+            "--redis-latency",
+            type=float,
+            default=0.1,
+            help="Milliseconds per round trip to the fake Redis server (default: 0.1)",
+        )
+
+    def handle(self, *args, **options):
+        with test_database(), fake_redis(options["redis_latency"] / 1000) as server:
+            user = get_user_model().objects.create_user("user")
+            self.stdout.write(format_header())
+            for name, engine in ENGINES:
+                with override_settings(SESSION_ENGINE=engine):
+                    self.run(name, user, options["calls"])
+            # sessions fall back to the database, but the dashboard needs Redis
+            server.connected = False
+            with override_settings(SESSION_ENGINE="bookmarks.redis_sessions"):
+                self.run("redis unavailable", user, options["calls"], requests=False)
+        self.stdout.write(self.style.SUCCESS("Successfully benchmarked sessions"))
+
+    def run(self, name, user, calls, requests=True):
+        SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+        client = Client()
+        client.force_login(user)
+        session_key = client.session.session_key
+
+        # what SessionMiddleware does around a view
+        def respond(store):
+            if store.modified:
+                store.save()
+
+        def read():
+            store = SessionStore(session_key)
+            store.get(SESSION_KEY)
+            respond(store)
+
+        def unchanged():
+            # such as login() of the user already logged in
+            store = SessionStore(session_key)
+            store[SESSION_KEY] = store[SESSION_KEY]
+            respond(store)
+
+        def changed(i):
+            store = SessionStore(session_key)
+            store["counter"] = i
+            respond(store)
+
+        benchmarks = [
+            ("read", read, [()] * calls),
+            ("unchanged write", unchanged, [()] * calls),
+            ("changed write", changed, [(i,) for i in range(calls)]),
+        ]
+        if requests:
+            benchmarks.append(
+                ("dashboard request", client.get, [("/account/",)] * (calls // 10))
+            )
+        for label, func, args_list in benchmarks:
+            self.stdout.write(format_row(f"{name}, {label}", measure(func, args_list)))
@@ -1,20 +1,84 @@
 # account/management/commands/cleanup_profiles.py
 
-from account.models import Profile
+import time
+
+from account.models import Profile, ensure_profiles
 from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Min
+
+
+def batches(queryset, field, size):
+    """batches yields lists of up to size rows of a values_list QuerySet, ordered by
+    field, whose first value must be field. Every batch is a new query starting after
+    the last row of the previous one, so rows can be changed between batches.
+    """
+    last = None
+    while True:
+        batch = queryset.order_by(field)
+        if last is not None:
+            batch = batch.filter(**{f"{field}__gt": last})
+        batch = list(batch[:size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1][0] if isinstance(batch[-1], tuple) else batch[-1]
 
 
 class Command(BaseCommand):
     help = "Ensure all users have a profile and remove duplicates"
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Users handled per query (default: 1000)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be changed without changing anything",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        dry_run = options["dry_run"]
+        started = time.perf_counter()
+
+        # the oldest profile of every user with several is kept
+        duplicates = (
+            Profile.objects.order_by()
+            .values("user_id")
+            .annotate(profiles=Count("id"), keep=Min("id"))
+            .filter(profiles__gt=1)
+            .values_list("user_id", "keep")
+        )
+        deleted = 0
+        for chunk in batches(duplicates, "user_id", batch_size):
+            extra = Profile.objects.filter(
+                user_id__in=[user_id for user_id, _ in chunk]
+            ).exclude(id__in=[keep for _, keep in chunk])
+            if dry_run:
+                deleted += extra.count()
+            else:
+                with transaction.atomic():
+                    deleted += extra.delete()[0]
+            self.stdout.write(f"{deleted} duplicate profiles removed so far")
+
         User = get_user_model()
+        missing = User.objects.filter(profile__isnull=True).values_list("id", flat=True)
+        created = 0
+        for chunk in batches(missing, "id", batch_size):
+            if not dry_run:
+                ensure_profiles(chunk, batch_size)
+            created += len(chunk)
+            self.stdout.write(f"{created} missing profiles created so far")
 
-        for user in User.objects.all():
-            profiles = Profile.objects.filter(user=user)
-            if profiles.count() > 1:
-                # If there are duplicates, delete the extras
-                profiles[1:].delete()
-            Profile.objects.get_or_create(user=user)
+        prefix = "Dry run: would have " if dry_run else ""
+        self.stdout.write(
+            f"{prefix}removed {deleted} duplicate profiles and created {created} "
+            f"missing profiles in {time.perf_counter() - started:.2f}s"
+        )
         self.stdout.write(self.style.SUCCESS("Successfully cleaned up profiles"))
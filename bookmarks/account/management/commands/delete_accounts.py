@@ -0,0 +1,67 @@
+# account/management/commands/delete_accounts.py
+
+import statistics
+import time
+from collections import Counter
+
+from account.deletion import BATCH_SIZE, delete_account
+from account.models import AccountDeletion
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the disabled accounts queued for deletion, with their images, likes, "
+        "follows and actions, in small batches"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help=f"Rows deleted per transaction (default: {BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between batches, to leave room for other writers",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            help="Accounts deleted at most (default: all the queued accounts)",
+        )
+
+    def handle(self, *args, **options):
+        # accounts enabled again since are left alone
+        deletions = AccountDeletion.objects.filter(user__is_active=False)
+        deletions = deletions.select_related("user")[: options["limit"]]
+        for deletion in deletions:
+            self.delete(deletion.user, options)
+        self.stdout.write(self.style.SUCCESS("Successfully deleted accounts"))
+
+    def delete(self, user, options):
+        username = user.username
+        rows = Counter()
+        lock_times = []
+        started = time.perf_counter()
+        for stage, count, seconds in delete_account(
+            user, options["batch_size"], options["pause"]
+        ):
+            rows[stage] += count
+            lock_times.append(seconds)
+            if options["verbosity"] > 1:
+                self.stdout.write(
+                    f"{username}: {count} {stage} in {seconds * 1000:.1f} ms"
+                )
+        elapsed = time.perf_counter() - started
+        lock_ms = sorted(seconds * 1000 for seconds in lock_times)
+        deleted = ", ".join(f"{count} {stage}" for stage, count in rows.items())
+        self.stdout.write(
+            f"Deleted {username} in {len(lock_ms)} batches and {elapsed:.2f}s: "
+            f"{deleted}\n"
+            f"Lock time per batch: mean {statistics.mean(lock_ms):.1f} ms, "
+            f"p95 {lock_ms[int(len(lock_ms) * 0.95)]:.1f} ms, max {lock_ms[-1]:.1f} ms"
+        )
@@ -0,0 +1,42 @@
+# account/management/commands/refresh_suggestions.py
+
+from account.suggestions import MAX_PAIRS, TOP_K, refresh_suggestions
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the friends of friends follow suggestions and store them in Redis, "
+        "for the users whose follows changed, or for everybody with --full"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Recompute the suggestions of every user",
+        )
+        parser.add_argument(
+            "--top-k",
+            type=int,
+            default=TOP_K,
+            help=f"Suggestions stored per user (default: {TOP_K})",
+        )
+        parser.add_argument(
+            "--max-pairs",
+            type=int,
+            default=MAX_PAIRS,
+            help=f"Two-hop paths computed per batch (default: {MAX_PAIRS})",
+        )
+
+    def handle(self, *args, **options):
+        stats = refresh_suggestions(
+            full=options["full"], top_k=options["top_k"], max_pairs=options["max_pairs"]
+        )
+        self.stdout.write(
+            f"Graph of {stats['users']} users and {stats['edges']} follows exported "
+            f"in {stats['export_seconds']:.2f}s\n"
+            f"Suggestions of {stats['refreshed']} users refreshed "
+            f"in {stats['compute_seconds']:.2f}s"
+        )
+        self.stdout.write(self.style.SUCCESS("Successfully refreshed suggestions"))
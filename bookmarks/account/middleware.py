@@ -0,0 +1,80 @@
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, load_backend
+from django.contrib.auth import _get_user_session_key
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from .user_cache import get_cached_user
+
+
+def get_user(request):
+    """get_user returns the user of the session, like django.contrib.auth.get_user, but
+    reads it from the user context cache. The session is verified against the cached
+    user, whose cache is invalidated whenever their password changes.
+
+    Args:
+        request (HttpRequest): the current request
+
+    Returns:
+        object: User instance, or AnonymousUser
+    """
+    if not hasattr(request, "_cached_user"):
+        request._cached_user = _get_user(request) or AnonymousUser()
+    return request._cached_user
+
+
+def _get_user(request):
+    try:
+        user_id = _get_user_session_key(request)
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return None
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return None
+    user = get_cached_user(user_id)
+    if user is None:
+        return None
+    backend = load_backend(backend_path)
+    # ModelBackend refuses inactive users
+    if hasattr(backend, "user_can_authenticate") and not backend.user_can_authenticate(
+        user
+    ):
+        return None
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    session_auth_hash = user.get_session_auth_hash()
+    if session_hash and constant_time_compare(session_hash, session_auth_hash):
+        return user
+    # the session may have been signed with a previous SECRET_KEY
+    if session_hash and any(
+        constant_time_compare(session_hash, fallback_auth_hash)
+        for fallback_auth_hash in user.get_session_auth_fallback_hash()
+    ):
+        request.session.cycle_key()
+        request.session[HASH_SESSION_KEY] = session_auth_hash
+        return user
+    request.session.flush()
+    return None
+
+
+async def auser(request):
+    """auser is the async version of get_user, for request.auser(). It shares the
+    user of request.user, so async views can use either.
+    """
+    return await sync_to_async(get_user)(request)
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """CachedAuthenticationMiddleware replaces AuthenticationMiddleware, so that
+    request.user comes from the user context cache of account.user_cache, with its
+    profile and following_ids, instead of a query per request.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.auser = partial(auser, request)
@@ -0,0 +1,70 @@
+# Generated by Django 5.0.6 on 2026-10-19 14:27
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(queryset, field):
+    """count_of returns a subquery counting the rows of queryset per profile user."""
+    counts = (
+        queryset.filter(**{field: OuterRef("user_id")})
+        .values(field)
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def backfill_counts(apps, schema_editor):
+    """backfill_counts removes duplicate follow relationships, which the new unique
+    constraint doesn't allow, and computes the denormalized counts of every profile.
+    """
+    Contact = apps.get_model("account", "Contact")
+    Image = apps.get_model("images", "Image")
+    Profile = apps.get_model("account", "Profile")
+    first_contacts = (
+        Contact.objects.values("user_from", "user_to")
+        .annotate(first_id=Min("id"))
+        .values("first_id")
+    )
+    Contact.objects.exclude(id__in=first_contacts).delete()
+    Profile.objects.update(
+        followers_count=count_of(Contact.objects.all(), "user_to"),
+        following_count=count_of(Contact.objects.all(), "user_from"),
+        images_count=count_of(Image.objects.all(), "user"),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("account", "0002_contact"),
+        ("images", "0002_image_total_likes_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="following_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="images_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="contact",
+            constraint=models.UniqueConstraint(
+                fields=("user_from", "user_to"), name="unique_contact"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+# expression indexes for the case-insensitive prefix search of the people directory,
+# on the columns listed in account.views.SEARCH_FIELDS
+SEARCH_FIELDS = ["username", "first_name", "last_name"]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("account", "0003_profile_followers_count_profile_following_count_and_more"),
+        # the indexes are on auth_user itself; on SQLite they would be lost if a later
+        # auth migration rebuilt the table
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=f"CREATE INDEX account_user_{field}_lower_idx "
+            f"ON auth_user (LOWER({field}))",
+            reverse_sql=f"DROP INDEX account_user_{field}_lower_idx",
+        )
+        for field in SEARCH_FIELDS
+    ]
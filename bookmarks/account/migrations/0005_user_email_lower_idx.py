@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("account", "0004_user_search_indexes"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        # e-mail logins look users up by LOWER(email), see account.authentication. The
+        # index isn't unique because existing accounts may already share an address;
+        # the registration and edit forms keep new addresses unique, ignoring case
+        migrations.RunSQL(
+            sql="CREATE INDEX account_user_email_lower_idx ON auth_user (LOWER(email))",
+            reverse_sql="DROP INDEX account_user_email_lower_idx",
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
 
 
 # Defines the tables of data for the account application
@@ -20,10 +22,93 @@ class Profile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     date_of_birth = models.DateField(blank=True, null=True)
     photo = models.ImageField(upload_to="users/%Y/%m/%d/", blank=True)
+    # denormalized counts, maintained by the Contact and Image signal receivers
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    images_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"Profile of {self.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # snapshot of the loaded values, compared by changed_fields()
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def changed_fields(self):
+        """changed_fields lists the fields whose value changed since the profile was
+        loaded from the database. Fields that were deferred when it was loaded count as
+        changed once they have a value, as Django would save them.
+
+        Returns:
+            list: attribute names of the changed fields, every field for a profile that
+            wasn't loaded from the database
+        """
+        loaded = getattr(self, "_loaded_values", None)
+        fields = [
+            field.attname
+            for field in self._meta.concrete_fields
+            if not field.primary_key
+        ]
+        if loaded is None:
+            return fields
+        return [
+            name
+            for name in fields
+            if (name not in loaded and name in self.__dict__)
+            or (name in loaded and getattr(self, name) != loaded[name])
+        ]
+
+    def save(self, *args, update_fields=None, **kwargs):
+        """save only writes the fields that changed since the profile was loaded, and
+        nothing if none did, unless update_fields is given. A stale copy of the profile
+        therefore never overwrites the counts maintained by adjust_profile_count.
+        """
+        if update_fields is None and not self._state.adding:
+            update_fields = self.changed_fields()
+            if not update_fields:
+                return
+        super().save(*args, update_fields=update_fields, **kwargs)
+        saved = None if update_fields is None else set(update_fields)
+        loaded = getattr(self, "_loaded_values", {})
+        for field in self._meta.concrete_fields:
+            if saved is None or field.name in saved or field.attname in saved:
+                value = getattr(self, field.attname)
+                loaded[field.attname] = field.get_prep_value(value)
+        self._loaded_values = loaded
+
+
+def adjust_profile_count(user_id, field, delta):
+    """adjust_profile_count atomically adds delta to one of the denormalized counts of
+    a user's profile, with an UPDATE based on the current value in the database. Counts
+    never go below zero.
+
+    Args:
+        user_id (int): id of the user whose profile is updated
+        field (string): followers_count, following_count or images_count
+        delta (int): amount to add, negative to subtract
+    """
+    Profile.objects.filter(user_id=user_id).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def ensure_profiles(user_ids, batch_size=1000):
+    """ensure_profiles creates the missing profiles of the given users with batched
+    INSERTs, ignoring the users that already have one.
+
+    Args:
+        user_ids (iterable): ids of the users
+        batch_size (int, optional): profiles inserted per query. Defaults to 1000.
+    """
+    Profile.objects.bulk_create(
+        (Profile(user_id=user_id) for user_id in user_ids),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+
 
 class Contact(models.Model):
     """Contact model contains a many-to-many relationship between users; those models
@@ -53,12 +138,40 @@ class Contact(models.Model):
         indexes = [
             models.Index(fields=["-created"]),
         ]
+        constraints = [
+            # also serves as the index of "does user_from follow user_to" lookups
+            models.UniqueConstraint(
+                fields=["user_from", "user_to"], name="unique_contact"
+            ),
+        ]
         ordering = ["-created"]
 
     def __str__(self):
         return f"{self.user_from} follows {self.user_to}"
 
 
+class AccountDeletion(models.Model):
+    """AccountDeletion queues a disabled account for deletion. The delete_accounts
+    management command deletes its images, likes, follows and actions in small batches,
+    then the user and this request.
+
+    Args:
+        models (OneToOneField): user: the disabled user
+        (DateTimeField) requested: when the deletion was requested
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, related_name="deletion", on_delete=models.CASCADE
+    )
+    requested = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["requested"]
+
+    def __str__(self):
+        return f"Deletion of {self.user}"
+
+
 # dynamically add the following fields to User
 user_model = get_user_model()
 user_model.add_to_class(
@@ -1,16 +1,82 @@
+from bookmarks.cache import bump_version
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import Profile
+from .authentication import unknown_email_key
+from .models import Contact, Profile, adjust_profile_count, ensure_profiles
+from .suggestions import mark_dirty
+from .user_cache import invalidate_user
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_profile(sender, instance, created, **kwargs):
     if created:
-        Profile.objects.get_or_create(user=instance)
+        ensure_profiles([instance.pk])
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
+    """save_profile saves the profile of a saved user if it was loaded with the user.
+    Profile.save only writes the fields that changed, so this is usually free.
+    """
+    profile = instance._state.fields_cache.get("profile")
+    if profile is not None:
+        profile.save()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def forget_unknown_email(sender, instance, update_fields=None, **kwargs):
+    """forget_unknown_email lets EmailAuthBackend find a user as soon as their e-mail
+    address is saved, even if it was cached as unknown.
+    """
+    if update_fields is not None and "email" not in update_fields:
+        # e.g. last_login, updated on every login
+        return
+    if instance.email:
+        cache.delete(unknown_email_key(instance.email))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    """user_changed deletes the cached user context of a saved or deleted user, and
+    bumps the version of their profile fragments unless only last_login changed.
+    """
+    invalidate_user(instance.pk)
+    if update_fields is None or set(update_fields) != {"last_login"}:
+        bump_version("profile", instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    """profile_changed deletes the cached user context of the owner of a profile, and
+    bumps the version of their profile fragments.
+    """
+    invalidate_user(instance.user_id)
+    bump_version("profile", instance.user_id)
+
+
+@receiver(post_save, sender=Contact)
+def contact_created(sender, instance, created, **kwargs):
+    """contact_created counts a new follow relationship on the profiles of both users."""
+    if created:
+        adjust_profile_count(instance.user_from_id, "following_count", 1)
+        adjust_profile_count(instance.user_to_id, "followers_count", 1)
+        mark_dirty(instance.user_from_id)
+        invalidate_user(instance.user_from_id, instance.user_to_id)
+        bump_version("contact", instance.user_to_id)
+
+
+@receiver(post_delete, sender=Contact)
+def contact_deleted(sender, instance, **kwargs):
+    """contact_deleted uncounts a removed follow relationship on the profiles of both
+    users.
+    """
+    adjust_profile_count(instance.user_from_id, "following_count", -1)
+    adjust_profile_count(instance.user_to_id, "followers_count", -1)
+    mark_dirty(instance.user_from_id)
+    invalidate_user(instance.user_from_id, instance.user_to_id)
+    bump_version("contact", instance.user_to_id)
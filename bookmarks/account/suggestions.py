@@ -0,0 +1,252 @@
+"""
+"Who to follow" suggestions from friends of friends.
+
+The suggestions of a user are the users followed by the users they follow, scored by
+how many of the users they follow do so. They are computed for every user at once by
+the refresh_suggestions management command: the Contact graph is exported into CSR
+arrays, and the two-hop paths of whole batches of users are counted with NumPy. The top
+suggestions of every user are stored in a Redis sorted set, so reading them on a page
+is a single ZREVRANGE.
+"""
+
+import time
+
+import numpy as np
+from bookmarks.redis_pool import r
+from bookmarks.sparse import (
+    build_csr,
+    cost_batches,
+    count_pairs,
+    dense_ids,
+    gather_rows,
+    top_k_per_row,
+)
+from django.contrib.auth import get_user_model
+
+from .models import Contact
+
+SUGGESTIONS_KEY = "user:{}:suggestions"
+# users whose follows changed since the last refresh
+DIRTY_KEY = "suggestions:dirty"
+# dirty users taken by the refresh in progress, or by one that was interrupted
+PROCESSING_KEY = "suggestions:dirty:processing"
+TOP_K = 20
+# two-hop paths expanded per batch, which bounds the memory used by a batch
+MAX_PAIRS = 5_000_000
+
+
+class FollowGraph:
+    """FollowGraph holds the Contact graph as CSR arrays over dense row numbers.
+
+    Args:
+        user_ids (ndarray): database id of the user of every row
+        indptr, indices (ndarray): users followed by every row
+        rev_indptr, rev_indices (ndarray): followers of every row
+    """
+
+    def __init__(self, user_ids, indptr, indices, rev_indptr, rev_indices):
+        self.user_ids = user_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.rev_indptr = rev_indptr
+        self.rev_indices = rev_indices
+
+    @classmethod
+    def from_database(cls, chunk_size=100_000):
+        """from_database exports every follow relationship, streaming the rows from
+        the database in chunks.
+
+        Args:
+            chunk_size (int, optional): rows fetched at a time. Defaults to 100_000.
+
+        Returns:
+            FollowGraph: the graph
+        """
+        edges = Contact.objects.order_by().values_list("user_from_id", "user_to_id")
+        chunks = []
+        chunk = []
+        for edge in edges.iterator(chunk_size=chunk_size):
+            chunk.append(edge)
+            if len(chunk) == chunk_size:
+                chunks.append(np.array(chunk, dtype=np.int64))
+                chunk = []
+        chunks.append(np.array(chunk, dtype=np.int64).reshape(-1, 2))
+        edges = np.concatenate(chunks)
+        user_ids, rows = dense_ids(edges.ravel())
+        rows = rows.reshape(-1, 2)
+        n_rows = len(user_ids)
+        indptr, indices = build_csr(rows[:, 0], rows[:, 1], n_rows)
+        rev_indptr, rev_indices = build_csr(rows[:, 1], rows[:, 0], n_rows)
+        return cls(user_ids, indptr, indices, rev_indptr, rev_indices)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    @property
+    def edges(self):
+        return len(self.indices)
+
+    def rows_of(self, user_ids):
+        """rows_of returns the rows of the given users that are part of the graph."""
+        user_ids = np.asarray(list(user_ids), dtype=np.int64)
+        rows = np.searchsorted(self.user_ids, user_ids)
+        found = rows < len(self.user_ids)
+        found[found] = self.user_ids[rows[found]] == user_ids[found]
+        return rows[found]
+
+    def suggest(self, rows, top_k=TOP_K, max_pairs=MAX_PAIRS):
+        """suggest computes the friends of friends of the given rows, in batches of
+        about max_pairs two-hop paths. Users that are already followed and the users
+        themselves are excluded.
+
+        Args:
+            rows (ndarray): rows to compute suggestions for
+            top_k (int, optional): suggestions kept per row. Defaults to TOP_K.
+            max_pairs (int, optional): batch budget. Defaults to MAX_PAIRS.
+
+        Yields:
+            tuple: for every batch, the batch rows, and the rows, suggested rows and
+            scores of its suggestions, best first within a row
+        """
+        n_rows = len(self)
+        degrees = np.diff(self.indptr)
+        # two-hop paths of a row: the sum of the out-degrees of the users it follows
+        edge_rows = np.repeat(np.arange(n_rows), degrees)
+        costs = np.bincount(edge_rows, weights=degrees[self.indices], minlength=n_rows)
+        for positions in cost_batches(costs[rows], max_pairs):
+            batch = rows[positions]
+            owners, followed = gather_rows(self.indptr, self.indices, batch)
+            hops, candidates = gather_rows(self.indptr, self.indices, followed)
+            sources, candidates, scores = count_pairs(
+                batch[owners[hops]], candidates, n_rows
+            )
+            followed_keys = batch[owners].astype(np.int64) * n_rows + followed
+            keep = (candidates != sources) & ~np.isin(
+                sources * n_rows + candidates, followed_keys
+            )
+            yield batch, *top_k_per_row(
+                sources[keep], candidates[keep], scores[keep], top_k
+            )
+
+
+def store_suggestions(graph, batch, sources, candidates, scores):
+    """store_suggestions replaces the stored suggestions of a batch of users.
+
+    Args:
+        graph (FollowGraph): the graph the rows refer to
+        batch (ndarray): rows whose suggestions are replaced
+        sources, candidates, scores (ndarray): suggestions of the batch, by row
+    """
+    user_ids = graph.user_ids
+    pipeline = r.pipeline(transaction=False)
+    for user_id in user_ids[batch]:
+        pipeline.delete(SUGGESTIONS_KEY.format(user_id))
+    bounds = np.flatnonzero(np.diff(sources)) + 1
+    for rows, cols, values in zip(
+        np.split(sources, bounds),
+        np.split(candidates, bounds),
+        np.split(scores, bounds),
+    ):
+        if len(rows):
+            pipeline.zadd(
+                SUGGESTIONS_KEY.format(user_ids[rows[0]]),
+                dict(zip(user_ids[cols].tolist(), values.tolist())),
+            )
+    pipeline.execute()
+
+
+def refresh_suggestions(full=False, top_k=TOP_K, max_pairs=MAX_PAIRS):
+    """refresh_suggestions recomputes the stored suggestions. Incremental refreshes only
+    recompute the users whose follows changed and their followers, whose friends of
+    friends include the changed follows.
+
+    Args:
+        full (bool, optional): recompute every user. Defaults to False.
+        top_k (int, optional): suggestions kept per user. Defaults to TOP_K.
+        max_pairs (int, optional): batch budget. Defaults to MAX_PAIRS.
+
+    Returns:
+        dict: users and edges in the graph, users refreshed, and the seconds spent
+        exporting the graph and computing and storing the suggestions
+    """
+    started = time.perf_counter()
+    dirty = take_dirty()
+    try:
+        graph = FollowGraph.from_database()
+        exported = time.perf_counter()
+        if full:
+            rows = np.flatnonzero(np.diff(graph.indptr))
+        else:
+            dirty_rows = graph.rows_of(int(user_id) for user_id in dirty)
+            _, followers = gather_rows(graph.rev_indptr, graph.rev_indices, dirty_rows)
+            rows = np.union1d(dirty_rows, followers)
+        # the rows get their suggestions replaced; dirty users left out, such as those
+        # who no longer follow anybody, have no suggestions left
+        gone = {int(user_id) for user_id in dirty} - set(graph.user_ids[rows].tolist())
+        if gone:
+            r.delete(*(SUGGESTIONS_KEY.format(user_id) for user_id in gone))
+        for batch, sources, candidates, scores in graph.suggest(rows, top_k, max_pairs):
+            store_suggestions(graph, batch, sources, candidates, scores)
+    except BaseException:
+        # the next refresh takes them again
+        pipeline = r.pipeline(transaction=True)
+        pipeline.sunionstore(DIRTY_KEY, DIRTY_KEY, PROCESSING_KEY)
+        pipeline.delete(PROCESSING_KEY)
+        pipeline.execute()
+        raise
+    r.delete(PROCESSING_KEY)
+    finished = time.perf_counter()
+    return {
+        "users": len(graph),
+        "edges": graph.edges,
+        "refreshed": len(rows),
+        "export_seconds": exported - started,
+        "compute_seconds": finished - exported,
+    }
+
+
+def take_dirty():
+    """take_dirty atomically moves the dirty users to PROCESSING_KEY, along with those
+    left there by an interrupted refresh. Users marked dirty from then on stay in
+    DIRTY_KEY, for the next refresh.
+
+    Returns:
+        set: ids of the dirty users, as bytes
+    """
+    pipeline = r.pipeline(transaction=True)
+    pipeline.sunionstore(PROCESSING_KEY, PROCESSING_KEY, DIRTY_KEY)
+    pipeline.delete(DIRTY_KEY)
+    pipeline.smembers(PROCESSING_KEY)
+    return pipeline.execute()[-1]
+
+
+def mark_dirty(user_id):
+    """mark_dirty queues a user whose follows changed for the next incremental
+    refresh.
+    """
+    r.sadd(DIRTY_KEY, user_id)
+
+
+def get_suggestions(user, count=5):
+    """get_suggestions reads the stored suggestions of a user.
+
+    Args:
+        user (object): User instance
+        count (int, optional): number of suggestions. Defaults to 5.
+
+    Returns:
+        list: active User objects with their profile, best suggestion first
+    """
+    ids = [
+        int(user_id)
+        for user_id in r.zrevrange(SUGGESTIONS_KEY.format(user.id), 0, count - 1)
+    ]
+    if not ids:
+        return []
+    users = (
+        get_user_model()
+        .objects.filter(id__in=ids, is_active=True)
+        .select_related("profile")
+        .in_bulk()
+    )
+    return [users[user_id] for user_id in ids if user_id in users]
@@ -46,8 +46,12 @@ urlpatterns = [
     path("register/", views.register, name="register"),
     # url for user profile editing
     path("edit/", views.edit, name="edit"),
+    # url for deleting the account
+    path("delete/", views.delete_account, name="delete_account"),
     # url for list of active users
     path("users/", views.user_list, name="user_list"),
+    # url for the autocomplete of the people directory
+    path("users/search/", views.user_search, name="user_search"),
     # url for following a user
     path("users/follow/", views.user_follow, name="user_follow"),
     # url for details about a particular user
@@ -0,0 +1,106 @@
+"""
+Cached user context for authenticated requests.
+
+CachedAuthenticationMiddleware reads the user of every request from the cache instead
+of the database, together with their profile and the ids of the users they follow, so
+that base.html and the views can use request.user.profile and request.user.following_ids
+without a query. The signals of account and images delete the cached context of a user
+whenever their User, Profile or follows change.
+
+The cache is in Redis, like the sessions of bookmarks.redis_sessions. While Redis is
+unavailable, users are read from the database, so the sessions saved in the database
+meanwhile keep working.
+"""
+
+import logging
+
+import redis
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from .models import Contact, Profile, ensure_profiles
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_KEY = "user:{}:context"
+
+
+def load_user(user_id):
+    """load_user reads a user, their profile and the ids of the users they follow from
+    the primary database, since a replica could be behind, e.g. miss a password change,
+    and its data would then stay in the cache.
+
+    Args:
+        user_id (int): id of the user
+
+    Returns:
+        object: User instance with its profile and a following_ids frozenset, or None
+    """
+    User = get_user_model()
+    try:
+        user = User.objects.using("default").select_related("profile").get(pk=user_id)
+    except User.DoesNotExist:
+        return None
+    if not hasattr(user, "profile"):
+        # e.g. users created with bulk_create, which sends no signals
+        ensure_profiles([user_id])
+        user.profile = Profile.objects.using("default").get(user_id=user_id)
+    user.following_ids = frozenset(
+        Contact.objects.using("default")
+        .filter(user_from_id=user_id)
+        .values_list("user_to_id", flat=True)
+    )
+    return user
+
+
+def get_cached_user(user_id):
+    """get_cached_user returns the cached user context of a user, loading and caching
+    it on a miss.
+
+    Args:
+        user_id (int): id of the user
+
+    Returns:
+        object: User instance with its profile and a following_ids frozenset, or None
+    """
+    key = USER_CACHE_KEY.format(user_id)
+    try:
+        user = cache.get(key)
+    except redis.RedisError:
+        logger.warning("Redis is unavailable, loading the user from the database")
+        return load_user(user_id)
+    if user is None:
+        user = load_user(user_id)
+        if user is not None:
+            try:
+                cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+            except redis.RedisError:
+                logger.warning("Redis is unavailable, the user is not cached")
+    return user
+
+
+def invalidate_user(*user_ids):
+    """invalidate_user deletes the cached user context of the given users. While Redis
+    is unavailable, the contexts can't be deleted, and expire after USER_CACHE_TIMEOUT.
+    """
+    try:
+        cache.delete_many([USER_CACHE_KEY.format(user_id) for user_id in user_ids])
+    except redis.RedisError:
+        logger.warning("Redis is unavailable, cached users were not invalidated")
+
+
+def get_following_ids(user):
+    """get_following_ids returns the ids of the users a user follows, from their cached
+    context when they have one.
+
+    Args:
+        user (object): User instance
+
+    Returns:
+        frozenset: ids of the followed users
+    """
+    following_ids = getattr(user, "following_ids", None)
+    if following_ids is None:
+        following_ids = frozenset(user.following.values_list("id", flat=True))
+    return following_ids
@@ -1,18 +1,95 @@
-from actions.models import Action
-from actions.utils import create_action
+import sys
+
+from actions.feed import get_feed_page
+from actions.utils import acreate_action, create_action
+from bookmarks.cache import attach_versions
+from bookmarks.conditional import conditional, make_etag
+from bookmarks.pagination import paginate_keyset
+from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth import authenticate, get_user_model, login
+from django.contrib.auth import authenticate, get_user_model, login, logout
 from django.contrib.auth.decorators import login_required
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.http import HttpResponse, JsonResponse
-from django.shortcuts import get_object_or_404, render
+from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_POST
 
+from .decorators import alogin_required
+from .deletion import request_deletion
 from .forms import LoginForm, ProfileEditForm, UserEditForm, UserRegistrationForm
+from .lookups import db_lower
 from .models import Contact
+from .suggestions import get_suggestions
+from .user_cache import get_following_ids
 
 # retrieve the Django User model dynamically
 User = get_user_model()
 
+# fields searched by prefix; each one has an index on its lowercased value
+SEARCH_FIELDS = ["username", "first_name", "last_name"]
+
+
+def prefix_upper_bound(prefix):
+    """prefix_upper_bound returns the first string after every string starting with
+    the prefix, skipping the surrogate code points, which can't be encoded.
+
+    Args:
+        prefix (string): a non-empty prefix
+
+    Returns:
+        string: the upper bound, or None if no string comes after the prefix
+    """
+    while prefix:
+        code = ord(prefix[-1]) + 1
+        if 0xD800 <= code <= 0xDFFF:
+            code = 0xE000
+        if code <= sys.maxunicode:
+            return prefix[:-1] + chr(code)
+        # U+10FFFF is the last code point, the previous character is incremented
+        prefix = prefix[:-1]
+    return None
+
+
+def search_users(users, query):
+    """search_users filters users whose username, first name or last name starts with
+    the query, ignoring case. The prefix match is written as a range on the lowercased
+    column, LOWER(username) >= 'ann' AND LOWER(username) < 'ano', which the expression
+    indexes answer directly, unlike LIKE or ILIKE.
+
+    LOWER() only folds ASCII letters on SQLite, so the query is folded the same way
+    there, see account.lookups, and non-ASCII letters match their own case only. To
+    still find "Élodie" from "é", the query is also searched with its first letter in
+    the other case.
+
+    Args:
+        users (QuerySet): User objects to filter
+        query (string): the prefix typed by the user
+
+    Returns:
+        QuerySet: the matching users, or all of them if the query is empty
+    """
+    query = query.strip()
+    if not query:
+        return users
+    # in a stable order, so the SQL is the same every time
+    prefixes = dict.fromkeys(
+        db_lower(first + query[1:], users.db)
+        for first in (query[0].lower(), query[0].upper())
+    )
+    condition = Q()
+    for prefix in prefixes:
+        # the first string after every string starting with the prefix
+        upper = prefix_upper_bound(prefix)
+        for field in SEARCH_FIELDS:
+            bounds = {f"{field}_lower__gte": prefix}
+            if upper is not None:
+                bounds[f"{field}_lower__lt"] = upper
+            condition |= Q(**bounds)
+    return users.alias(
+        **{f"{field}_lower": Lower(field) for field in SEARCH_FIELDS}
+    ).filter(condition)
+
 
 # These classes define the views for the account application
 def user_login(request):
@@ -60,25 +137,34 @@ def dashboard(request):
     """dashboard funtion-based view displays a dashboard when users log into their
     account. If authenticated, the user gets the decorated view. If not, user is
     redirected to the login URL, with their requested URL as GET parameter 'next'.
+    Repetitive actions are grouped into single items. Older actions are loaded with the
+    'cursor' GET parameter; with 'actions_only' set, only the actions are rendered, for
+    the infinite scroll.
 
     Returns:
-        HttpResponse: account/dashboard.html
-        dict: includes section:dashboard, and actions:actions which will show the first
-        10 actions returned. In the :model:`actions.Action` the ordering is set to return
-        the most recent items first, so a list of the most recent 10 items are returned.
+        HttpResponse: account/dashboard.html, or actions/action/list_actions.html for
+        'actions_only' requests with the next cursor in the X-Next-Cursor header
+        dict: includes section:dashboard, and groups:groups which will show the 10
+        most recent feed items before the cursor, and next_cursor to load older ones.
     """
-    # display all actions by default
-    actions = Action.objects.exclude(user=request.user)
-    following_ids = request.user.following.values_list("id", flat=True)
-    if following_ids:
-        # if the user is following others, retrieve only their actions
-        actions = actions.filter(user_id__in=following_ids)
-    actions = actions.select_related("user", "user__profile").prefetch_related(
-        "target"
-    )[:10]
-    return render(
-        request, "account/dashboard.html", {"section": "dashboard", "actions": actions}
-    )
+    groups, next_cursor = get_feed_page(request.user, request.GET.get("cursor"))
+    context = {
+        "section": "dashboard",
+        "groups": groups,
+        "next_cursor": next_cursor,
+        "action_cache_timeout": settings.ACTION_CACHE_TIMEOUT,
+        "action_cache_version": settings.ACTION_CACHE_VERSION,
+    }
+    if request.GET.get("actions_only"):
+        if not groups:
+            # no more actions, return an empty page
+            return HttpResponse("")
+        response = render(request, "actions/action/list_actions.html", context)
+        if next_cursor:
+            response["X-Next-Cursor"] = next_cursor
+        return response
+    context["suggestions"] = get_suggestions(request.user)
+    return render(request, "account/dashboard.html", context)
 
 
 def register(request):
@@ -146,40 +232,183 @@ def edit(request):
     )
 
 
+@login_required
+def delete_account(request):
+    """delete_account lets logged-in users delete their account. The account is
+    disabled and logged out at once, and deleted in the background by the
+    delete_accounts management command.
+
+    Args:
+        request (GET): shows the confirmation page
+        request (POST): disables the account and queues its deletion
+
+    Returns:
+        HttpResponse: the confirmation page, or a redirect to the login page
+    """
+    if request.method == "POST":
+        request_deletion(request.user)
+        logout(request)
+        messages.success(request, "Your account was disabled and will be deleted")
+        return redirect("login")
+    return render(request, "account/delete.html")
+
+
 @login_required
 def user_list(request):
-    """user_list is a simple list view for active User objects
+    """user_list is a list view for active User objects, paginated by username with a
+    cursor, and optionally filtered by the 'q' prefix search. Profiles are selected in
+    the same query, so a page costs the same number of queries however many users there
+    are. With 'users_only' set, only the users are rendered, for the infinite scroll.
 
     Args:
-        request (User model): gets all User objects
+        request (User model): gets a page of active User objects
 
     Returns:
-        HttpResponse: sends a list of all active User objects
+        HttpResponse: sends a page of active User objects, or
+        account/user/list_users.html for 'users_only' requests with the next cursor in
+        the X-Next-Cursor header
     """
-    users = User.objects.filter(is_active=True)
+    query = request.GET.get("q", "")
+    users = search_users(
+        User.objects.filter(is_active=True)
+        .select_related("profile")
+        .only("username", "first_name", "last_name", "profile__photo"),
+        query,
+    )
+    users, next_cursor = paginate_keyset(
+        users, ["username"], request.GET.get("cursor"), per_page=24
+    )
+    if request.GET.get("users_only"):
+        if not users:
+            # no more users, return an empty page
+            return HttpResponse("")
+        response = render(request, "account/user/list_users.html", {"users": users})
+        if next_cursor:
+            response["X-Next-Cursor"] = next_cursor
+        return response
     return render(
         request,
         "account/user/list.html",
-        {"section": "people", "users": users},
+        {
+            "section": "people",
+            "suggestions": get_suggestions(request.user),
+            "users": users,
+            "query": query,
+            "next_cursor": next_cursor,
+        },
+    )
+
+
+@login_required
+def user_search(request):
+    """user_search returns the first active users matching the 'q' prefix, for the
+    autocomplete of the people directory.
+
+    Args:
+        request (GET): the 'q' parameter holds the prefix typed so far
+
+    Returns:
+        JsonResponse: users, a list of username, name and url of up to 10 users
+    """
+    query = request.GET.get("q", "")
+    users = []
+    if query.strip():
+        users = search_users(
+            User.objects.filter(is_active=True).only(
+                "username", "first_name", "last_name"
+            ),
+            query,
+        ).order_by("username")[:10]
+    return JsonResponse(
+        {
+            "users": [
+                {
+                    "username": user.username,
+                    "name": user.get_full_name(),
+                    "url": user.get_absolute_url(),
+                }
+                for user in users
+            ]
+        }
     )
 
 
 @login_required
 def user_detail(request, username):
-    """user_detail is a detail view for User objects.
+    """user_detail is a detail view for User objects. The follower counts come from the
+    denormalized fields of the profile, and the images of the user are paginated with a
+    (created, id) cursor; with 'images_only' set, only the images are rendered, for the
+    infinite scroll. The profile and the images are cached fragments, which vary on the
+    versions of the profile, contacts and images of bookmarks.cache. The same versions
+    make up the ETag, so unchanged pages get 304 Not Modified.
 
     Args:
         request (User model): check User objects
         username (string): used to retrieve the active user with the given username
 
     Returns:
-        HttpResponse: 404 if no active user with the given username is found
+        HttpResponse: 404 if no active user with the given username is found, or
+        images/image/list_images.html for 'images_only' requests with the next cursor
+        in the X-Next-Cursor header
     """
-    user = get_object_or_404(User, username=username, is_active=True)
-    return render(
+    user = get_object_or_404(
+        User.objects.select_related("profile"), username=username, is_active=True
+    )
+    images, next_cursor = paginate_keyset(
+        user.images_created.only("id", "user", "title", "slug", "image", "created"),
+        ["-created", "-id"],
+        request.GET.get("cursor"),
+        per_page=8,
+    )
+    versions = attach_versions(images, ("profile", user.id), ("contact", user.id))
+    if request.GET.get("images_only"):
+        if not images:
+            # no more images, return an empty page
+            return HttpResponse("")
+        etag = make_etag(
+            request,
+            "user_detail_images",
+            user.id,
+            next_cursor,
+            [(image.id, image.cache_version) for image in images],
+        )
+        response = conditional(
+            request,
+            etag,
+            lambda: render(
+                request,
+                "images/image/list_images.html",
+                {"section": "people", "images": images},
+            ),
+        )
+        if next_cursor:
+            response["X-Next-Cursor"] = next_cursor
+        return response
+    is_following = user.id in get_following_ids(request.user)
+    etag = make_etag(
+        request,
+        "user_detail",
+        user.id,
+        is_following,
+        next_cursor,
+        sorted(versions.items()),
+    )
+    return conditional(
         request,
-        "account/user/detail.html",
-        {"section": "people", "user": user},
+        etag,
+        lambda: render(
+            request,
+            "account/user/detail.html",
+            {
+                "section": "people",
+                "user": user,
+                "is_following": is_following,
+                "profile_version": versions[("profile", user.id)],
+                "contact_version": versions[("contact", user.id)],
+                "images": images,
+                "next_cursor": next_cursor,
+            },
+        ),
     )
 
 
@@ -210,3 +439,36 @@ def user_follow(request):
         except User.DoesNotExist:
             return JsonResponse({"status": "error"})
     return JsonResponse({"status": "error"})
+
+
+@alogin_required
+@require_POST
+async def auser_follow(request):
+    """auser_follow is the async version of user_follow, served under ASGI. It uses the
+    async ORM, so waiting on the database doesn't hold a thread of the server.
+
+    Args:
+        request (POST): looking for id of user and follow action
+
+    Returns:
+        JsonResponse: status of ok or error
+    """
+    request_user = await request.auser()
+    user_id = request.POST.get("id")
+    action = request.POST.get("action")
+    if user_id and action:
+        try:
+            user = await User.objects.aget(id=user_id)
+            if action == "follow":
+                await Contact.objects.aget_or_create(
+                    user_from=request_user, user_to=user
+                )
+                await acreate_action(request_user, "is following", user)
+            else:
+                await Contact.objects.filter(
+                    user_from=request_user, user_to=user
+                ).adelete()
+            return JsonResponse({"status": "ok"})
+        except User.DoesNotExist:
+            return JsonResponse({"status": "error"})
+    return JsonResponse({"status": "error"})
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Action
+from .models import Action, ActionRollup
 
 
 # registers models for the actions app
@@ -16,3 +16,16 @@ class ActionAdmin(admin.ModelAdmin):
     list_display = ["user", "verb", "target", "created"]
     list_filter = ["created"]
     search_fields = ["verb"]
+
+
+@admin.register(ActionRollup)
+class ActionRollupAdmin(admin.ModelAdmin):
+    """ActionRollupAdmin shows the daily counts of purged actions on the administration
+    site.
+
+    Args:
+        admin (:model:`actions.ActionRollup`): the model to register
+    """
+
+    list_display = ["day", "verb", "target_ct", "count"]
+    list_filter = ["day", "verb"]
@@ -0,0 +1,169 @@
+from account.user_cache import get_following_ids
+from bookmarks.pagination import encode_cursor, paginate_keyset
+from django.contrib.contenttypes.models import ContentType
+
+from .models import Action
+from .rendering import prepare_groups
+
+# the feed is read newest first; id breaks ties between actions created at the same time
+FEED_ORDERING = ["-created", "-id"]
+ACTIONS_PER_PAGE = 10
+# actions fetched per page, as a multiple of ACTIONS_PER_PAGE, so that a page still has
+# ACTIONS_PER_PAGE items once repetitive actions have been grouped
+FEED_WINDOW_FACTOR = 5
+# past tense of the verbs of create_action, for the text of grouped items, such as
+# "Bob and 3 others followed Cat"
+PAST_TENSE = {
+    "bookmarked image": "bookmarked",
+    "is following": "followed",
+    "likes": "liked",
+}
+
+
+class ActionGroup:
+    """ActionGroup is one item of the activity stream: either a single action, or
+    consecutive actions with the same verb that were done by the same user to several
+    targets ("user" groups) or by several users to the same target ("target" groups).
+    Only the first, most recent, action of a group is rendered.
+
+    Args:
+        action (:model:`actions.Action`): the first action of the group
+    """
+
+    def __init__(self, action):
+        self.actions = [action]
+        self.kind = None
+
+    @property
+    def action(self):
+        return self.actions[0]
+
+    @property
+    def count(self):
+        return len(self.actions)
+
+    @property
+    def others(self):
+        """others is the number of distinct targets, or of users for "target" groups,
+        besides the ones of the first action. A group whose actions are all on the
+        first target, such as likes, unlikes and likes again, has none, and is rendered
+        as its first action.
+        """
+        if self.kind == "target":
+            return len({action.user_id for action in self.actions}) - 1
+        return len({action.target_id for action in self.actions}) - 1
+
+    @property
+    def verb(self):
+        """verb is the verb of the group in the past tense, for its text."""
+        return PAST_TENSE.get(self.action.verb, self.action.verb)
+
+    @property
+    def target_name(self):
+        """target_name is the name of the other targets, plural unless there is one."""
+        if self.action.target_ct_id is None:
+            return ""
+        model = ContentType.objects.get_for_id(self.action.target_ct_id).model_class()
+        if model is None:
+            return ""
+        if self.others == 1:
+            return model._meta.verbose_name
+        return model._meta.verbose_name_plural
+
+    def add(self, action):
+        """add appends the action to the group if it continues it.
+
+        Args:
+            action (:model:`actions.Action`): the action that follows the group
+
+        Returns:
+            bool: True if the action was added to the group
+        """
+        first = self.action
+        if action.verb != first.verb:
+            return False
+        same_user = (
+            action.user_id == first.user_id
+            and action.target_ct_id == first.target_ct_id
+        )
+        same_target = first.target_id is not None and (
+            action.target_ct_id,
+            action.target_id,
+        ) == (first.target_ct_id, first.target_id)
+        if self.kind is None:
+            if same_user:
+                self.kind = "user"
+            elif same_target:
+                self.kind = "target"
+            else:
+                return False
+        elif (self.kind == "user" and not same_user) or (
+            self.kind == "target" and not same_target
+        ):
+            return False
+        self.actions.append(action)
+        return True
+
+
+def coalesce_actions(actions):
+    """coalesce_actions groups consecutive, repetitive actions in a single pass.
+
+    Args:
+        actions (list): :model:`actions.Action` objects in feed order
+
+    Returns:
+        list: ActionGroup items in feed order
+    """
+    groups = []
+    for action in actions:
+        if not groups or not groups[-1].add(action):
+            groups.append(ActionGroup(action))
+    return groups
+
+
+def user_feed(user):
+    """user_feed builds the QuerySet of actions shown on the dashboard of a user. The
+    actions of the users they follow are shown, or everyone's actions if they don't
+    follow anybody yet. Their own actions, and those of disabled accounts, are never
+    shown.
+
+    Args:
+        user (object): User instance of the dashboard owner
+
+    Returns:
+        QuerySet: :model:`actions.Action` objects with their user and profile selected
+    """
+    # disabled accounts wait for deletion, see account.deletion
+    actions = Action.objects.exclude(user=user).filter(user__is_active=True)
+    following_ids = get_following_ids(user)
+    if following_ids:
+        # if the user is following others, retrieve only their actions
+        actions = actions.filter(user_id__in=following_ids)
+    return actions.select_related("user", "user__profile")
+
+
+def get_feed_page(user, cursor=None, per_page=ACTIONS_PER_PAGE):
+    """get_feed_page returns one page of the activity stream of a user, using keyset
+    pagination on (created, id) so older pages cost the same as the first one. A window
+    of actions is fetched and coalesced into groups, and the page ends after the last
+    action of its last group.
+
+    Args:
+        user (object): User instance of the dashboard owner
+        cursor (string, optional): cursor returned with the previous page. Defaults to
+        None, the most recent actions.
+        per_page (int, optional): items per page. Defaults to ACTIONS_PER_PAGE.
+
+    Returns:
+        tuple: list of ActionGroup items ready to render, and the cursor of the next
+        page or None
+    """
+    actions, next_cursor = paginate_keyset(
+        user_feed(user), FEED_ORDERING, cursor, per_page * FEED_WINDOW_FACTOR
+    )
+    groups = coalesce_actions(actions)
+    if len(groups) > per_page:
+        groups = groups[:per_page]
+        last = groups[-1].actions[-1]
+        next_cursor = encode_cursor([last.created, last.id])
+    return prepare_groups(groups), next_cursor
@@ -0,0 +1,146 @@
+# actions/management/commands/purge_actions.py
+
+import datetime
+import gzip
+import json
+import statistics
+import time
+from collections import Counter
+from pathlib import Path
+
+from actions.models import Action, ActionRollup
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+ARCHIVE_FIELDS = ["id", "user_id", "verb", "created", "target_ct_id", "target_id"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive actions older than the retention horizon to compressed JSON lines, "
+        "add them to the daily rollups and delete them in small primary key chunks"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.ACTION_RETENTION_DAYS,
+            help="Retention horizon in days (default: ACTION_RETENTION_DAYS)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Actions deleted per transaction (default: 500)",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between chunks, to leave room for other writers",
+        )
+        parser.add_argument(
+            "--archive-dir",
+            type=Path,
+            default=Path(settings.ACTION_ARCHIVE_DIR),
+            help="Directory for the archive (default: ACTION_ARCHIVE_DIR)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many actions would be purged",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=options["days"])
+        expired = Action.objects.filter(created__lt=cutoff)
+        if options["dry_run"]:
+            self.stdout.write(
+                f"{expired.count()} actions created before {cutoff:%Y-%m-%d %H:%M} "
+                "would be purged"
+            )
+            return
+
+        archive_dir = options["archive_dir"]
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        archive_path = archive_dir / f"actions-{timezone.now():%Y%m%d%H%M%S}.jsonl.gz"
+        chunk_size = options["chunk_size"]
+        lock_times = []
+        purged = 0
+        started = time.perf_counter()
+        with gzip.open(archive_path, "wt", encoding="utf-8") as archive:
+            last_id = 0
+            while True:
+                # walk the expired ids in order, so each chunk is a small primary key
+                # range no matter how sparse the ids are
+                ids = list(
+                    expired.filter(id__gt=last_id)
+                    .order_by("id")
+                    .values_list("id", flat=True)[:chunk_size]
+                )
+                if not ids:
+                    break
+                chunk = expired.filter(id__gte=ids[0], id__lte=ids[-1])
+                lock_started = time.perf_counter()
+                with transaction.atomic():
+                    rows = list(chunk.order_by("id").values(*ARCHIVE_FIELDS))
+                    for row in rows:
+                        row["created"] = row["created"].isoformat()
+                        archive.write(json.dumps(row) + "\n")
+                    # the archive must hold the rows before they are deleted
+                    archive.flush()
+                    self.rollup(rows)
+                    chunk.delete()
+                lock_times.append(time.perf_counter() - lock_started)
+                purged += len(rows)
+                last_id = ids[-1]
+                if options["verbosity"] > 1:
+                    self.stdout.write(
+                        f"purged ids {ids[0]}-{ids[-1]}: {len(rows)} actions in "
+                        f"{lock_times[-1] * 1000:.1f} ms"
+                    )
+                if options["pause"]:
+                    time.sleep(options["pause"])
+        elapsed = time.perf_counter() - started
+
+        if not purged:
+            archive_path.unlink()
+            self.stdout.write(f"No actions created before {cutoff:%Y-%m-%d %H:%M}")
+            return
+        lock_ms = sorted(seconds * 1000 for seconds in lock_times)
+        self.stdout.write(
+            f"Purged {purged} actions in {len(lock_ms)} chunks and {elapsed:.2f}s "
+            f"({purged / elapsed:.0f} actions/s)\n"
+            f"Lock time per chunk: mean {statistics.mean(lock_ms):.1f} ms, "
+            f"p95 {lock_ms[int(len(lock_ms) * 0.95)]:.1f} ms, max {lock_ms[-1]:.1f} ms\n"
+            f"Archive: {archive_path}"
+        )
+        self.stdout.write(self.style.SUCCESS("Successfully purged actions"))
+
+    def rollup(self, rows):
+        """rollup adds a chunk of purged actions to the per-day counts in
+        :model:`actions.ActionRollup`.
+
+        Args:
+            rows (list): archived action rows, with created as an ISO string
+        """
+        counts = Counter(
+            (
+                timezone.localdate(datetime.datetime.fromisoformat(row["created"])),
+                row["verb"],
+                row["target_ct_id"],
+            )
+            for row in rows
+        )
+        for (day, verb, target_ct_id), count in counts.items():
+            updated = ActionRollup.objects.filter(
+                day=day, verb=verb, target_ct_id=target_ct_id
+            ).update(count=F("count") + count)
+            if not updated:
+                ActionRollup.objects.create(
+                    day=day, verb=verb, target_ct_id=target_ct_id, count=count
+                )
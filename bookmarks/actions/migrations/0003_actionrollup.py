@@ -0,0 +1,50 @@
+# Generated by Django 5.0.6 on 2026-10-19 14:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("actions", "0002_action_actions_act_user_id_5d614b_idx"),
+        ("contenttypes", "0002_remove_content_type_name"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ActionRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("verb", models.CharField(max_length=255)),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "target_ct",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-day"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="actionrollup",
+            constraint=models.UniqueConstraint(
+                fields=("day", "verb", "target_ct"), name="unique_action_rollup"
+            ),
+        ),
+    ]
@@ -38,5 +38,42 @@ class Action(models.Model):
         indexes = [
             models.Index(fields=["-created"]),
             models.Index(fields=["target_ct", "target_id"]),
+            # the feed filters on the followed users and reads them newest first
+            models.Index(fields=["user", "-created"]),
         ]
         ordering = ["-created"]
+
+
+class ActionRollup(models.Model):
+    """ActionRollup keeps the number of actions per day, verb and target type once the
+    actions themselves have been purged by the purge_actions management command, so
+    historical activity can still be counted.
+
+    Args:
+        models (DateField): day the actions were created on
+        (CharField) verb: the verb of the actions
+        (ForeignKey) target_ct: :model:`ContentType` of the targets, if any
+        (PositiveIntegerField) count: number of purged actions
+    """
+
+    day = models.DateField()
+    verb = models.CharField(max_length=255)
+    target_ct = models.ForeignKey(
+        ContentType,
+        blank=True,
+        null=True,
+        related_name="+",
+        on_delete=models.CASCADE,
+    )
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "verb", "target_ct"], name="unique_action_rollup"
+            ),
+        ]
+        ordering = ["-day"]
+
+    def __str__(self):
+        return f"{self.day}: {self.count} x {self.verb}"
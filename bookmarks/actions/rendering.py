@@ -0,0 +1,161 @@
+from collections import defaultdict
+
+from bookmarks.cache import get_versions
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+from .models import Action
+
+# fragment names used by the {% cache %} blocks in actions/action/detail.html
+ACTION_FRAGMENTS = ["action_images", "action_info"]
+# fragment name of the text of grouped actions, in actions/action/group.html
+GROUP_FRAGMENT = "action_group_info"
+
+# columns actions/action/detail.html reads from each kind of target, anything else is
+# deferred. Models that are not listed here are loaded with all of their columns.
+TARGET_FIELDS = {
+    "auth.user": ["id", "username", "first_name", "last_name"],
+    "images.image": ["id", "title", "slug", "image"],
+}
+# kind of the bookmarks.cache version of each kind of target; targets of other models
+# have no version
+TARGET_VERSIONS = {"auth.user": "profile", "images.image": "image"}
+
+
+def target_version_key(action):
+    """target_version_key returns the (kind, id) pair of the version of the target of
+    an action, or None if its target has no version.
+    """
+    if action.target_ct_id is None or action.target_id is None:
+        return None
+    model = ContentType.objects.get_for_id(action.target_ct_id).model_class()
+    kind = TARGET_VERSIONS.get(model._meta.label_lower) if model else None
+    return (kind, action.target_id) if kind else None
+
+
+def attach_action_versions(actions):
+    """attach_action_versions reads the versions of the users and targets of actions
+    with a single cache query. Every action gets user_version and target_version
+    attributes, which the fragments of actions/action/detail.html and group.html vary
+    on, so they are rendered again once the name or photo of the user, or the target,
+    changed.
+
+    Args:
+        actions (list): :model:`actions.Action` objects
+    """
+    pairs = {}
+    for action in actions:
+        pairs[action.id] = (("profile", action.user_id), target_version_key(action))
+    versions = get_versions(
+        *{pair for action_pairs in pairs.values() for pair in action_pairs if pair}
+    )
+    for action in actions:
+        user_pair, target_pair = pairs[action.id]
+        action.user_version = versions[user_pair]
+        action.target_version = versions[target_pair] if target_pair else None
+
+
+def action_fragment_keys(action):
+    """action_fragment_keys builds the cache keys of the rendered fragments of an
+    action, matching the keys the {% cache %} template tag uses for them.
+
+    Args:
+        action (:model:`actions.Action`): the action being rendered, with its versions
+        attached by attach_action_versions
+
+    Returns:
+        list: one cache key per fragment in ACTION_FRAGMENTS
+    """
+    vary_on = [
+        action.id,
+        action.user_version,
+        action.target_version,
+        settings.ACTION_CACHE_VERSION,
+    ]
+    return [make_template_fragment_key(name, vary_on) for name in ACTION_FRAGMENTS]
+
+
+def group_fragment_keys(group):
+    """group_fragment_keys builds the cache keys of the fragments of a feed item. A
+    group without other targets or users is rendered as its first action; other groups
+    share the images of their first action and have their own text, which varies with
+    the number of others.
+
+    Args:
+        group (ActionGroup): the feed item being rendered
+
+    Returns:
+        list: the cache keys of the fragments of the item
+    """
+    keys = action_fragment_keys(group.action)
+    if not group.others:
+        return keys
+    action = group.action
+    vary_on = [
+        action.id,
+        action.user_version,
+        action.target_version,
+        group.kind,
+        group.others,
+        settings.ACTION_CACHE_VERSION,
+    ]
+    return [keys[0], make_template_fragment_key(GROUP_FRAGMENT, vary_on)]
+
+
+def load_targets(actions):
+    """load_targets replaces prefetch_related("target") for the activity stream. Targets
+    are grouped by target_ct, and each content type is fetched with a single query that
+    only selects the columns listed in TARGET_FIELDS. The objects are stored in the
+    GenericForeignKey cache, so action.target does not hit the database again.
+
+    Args:
+        actions (list): :model:`actions.Action` objects whose targets are needed
+    """
+    ids_by_ct = defaultdict(set)
+    for action in actions:
+        if action.target_ct_id is not None and action.target_id is not None:
+            ids_by_ct[action.target_ct_id].add(action.target_id)
+    targets = {}
+    for ct_id, ids in ids_by_ct.items():
+        model = ContentType.objects.get_for_id(ct_id).model_class()
+        if model is None:
+            # the model of this content type has been removed
+            continue
+        queryset = model._base_manager.all()
+        fields = TARGET_FIELDS.get(model._meta.label_lower)
+        if fields:
+            queryset = queryset.only(*fields)
+        targets[ct_id] = queryset.in_bulk(ids)
+    for action in actions:
+        target = targets.get(action.target_ct_id, {}).get(action.target_id)
+        Action.target.set_cached_value(action, target)
+
+
+def prepare_groups(groups):
+    """prepare_groups gets a window of feed items ready to be rendered. The versions of
+    their users and targets are read with a single cache round trip, and so are the
+    cached fragments of every item, and targets
+    are only loaded for the items that have to be rendered again. Only the first
+    action of a group is rendered, so the other actions of a group never load their
+    targets. A warm feed is rendered without querying any target.
+
+    Args:
+        groups (list): ActionGroup items, whose actions have user and user__profile
+        selected
+
+    Returns:
+        list: the groups
+    """
+    attach_action_versions([group.action for group in groups])
+    keys = {group.action.id: group_fragment_keys(group) for group in groups}
+    cached = cache.get_many([key for group_keys in keys.values() for key in group_keys])
+    missing = [
+        group.action
+        for group in groups
+        if not all(key in cached for key in keys[group.action.id])
+    ]
+    if missing:
+        load_targets(missing)
+    return groups
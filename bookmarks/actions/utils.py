@@ -1,5 +1,6 @@
 import datetime
 
+from asgiref.sync import sync_to_async
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 
@@ -32,3 +33,29 @@ def create_action(user, verb, target=None):
         action.save()
         return True
     return False
+
+
+async def acreate_action(user, verb, target=None):
+    """acreate_action is the async version of create_action, for async views.
+
+    Args:
+        user (object): user initiating the action
+        verb (string): the action being created
+        target (object, optional): what to apply the action to. Defaults to None.
+    """
+    now = timezone.now()
+    last_minute = now - datetime.timedelta(seconds=60)
+    similar_actions = Action.objects.filter(
+        user_id=user.id, verb=verb, created__gte=last_minute
+    )
+    if target:
+        # content types are cached after the first lookup, which may query
+        target_ct = await sync_to_async(ContentType.objects.get_for_model)(target)
+        similar_actions = similar_actions.filter(
+            target_ct=target_ct, target_id=target.id
+        )
+    if not await similar_actions.aexists():
+        action = Action(user=user, verb=verb, target=target)
+        await action.asave()
+        return True
+    return False
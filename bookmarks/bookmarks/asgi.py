@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bookmarks.settings")
+# serve the async versions of the hot views
+os.environ.setdefault("DJANGO_ROOT_URLCONF", "bookmarks.asgi_urls")
+# leave out the sync-only debug toolbar, see DEBUG_TOOLBAR in settings
+os.environ.setdefault("DJANGO_ASGI", "1")
 
 application = get_asgi_application()
@@ -0,0 +1,19 @@
+"""
+URL configuration for bookmarks project under ASGI.
+
+The async versions of the hot views are matched before the sync patterns of
+bookmarks.urls, which they mirror. They have no names, so reverse() and {% url %} keep
+using the names of the sync patterns, which give the same URLs.
+"""
+
+from account import views as account_views
+from django.urls import path
+from images import views as images_views
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path("account/users/follow/", account_views.auser_follow),
+    path("images/detail/<int:id>/<slug:slug>/", images_views.aimage_detail),
+    path("images/like/", images_views.aimage_like),
+] + sync_urlpatterns
@@ -0,0 +1,233 @@
+"""
+Helpers for the benchmark management commands.
+
+Benchmarks run against a throwaway test database, created and destroyed like the ones
+of manage.py test, so they can fill it with as many rows as they need without touching
+the development data.
+"""
+
+import asyncio
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import fakeredis
+import numpy as np
+from bookmarks import redis_pool
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from images.models import Image
+from PIL import Image as PILImage
+
+
+@contextmanager
+def test_database(verbosity=0, on_disk=False):
+    """test_database creates the test databases for the duration of the block, with
+    every migration applied. The test environment is set up too, like manage.py test
+    does, with DEBUG off, so the test Client can be used, and uploaded files go to a
+    temporary MEDIA_ROOT.
+
+    Args:
+        verbosity (int, optional): verbosity of the database setup. Defaults to 0.
+        on_disk (bool, optional): keep a SQLite test database in a file rather than in
+            memory, where connections of different threads lock whole tables. Defaults
+            to False.
+    """
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as directory:
+        test_settings = connection.settings_dict["TEST"]
+        old_name = test_settings["NAME"]
+        if on_disk and connection.vendor == "sqlite":
+            test_settings["NAME"] = os.path.join(directory, "test.sqlite3")
+        old_config = setup_databases(verbosity, interactive=False, aliases={"default"})
+        try:
+            with override_settings(DEBUG=False, MEDIA_ROOT=directory):
+                yield
+        finally:
+            teardown_databases(old_config, verbosity)
+            test_settings["NAME"] = old_name
+            teardown_test_environment()
+
+
+@contextmanager
+def fake_redis(latency=0.0):
+    """fake_redis replaces Redis with an in-memory fakeredis server for the duration of
+    the block: the shared pools of bookmarks.redis_pool use it, and the default cache
+    is kept in local memory. Every round trip to the fake server waits latency seconds,
+    like one to a Redis server over the network would.
+
+    Args:
+        latency (float, optional): seconds per round trip. Defaults to 0.0.
+
+    Yields:
+        FakeServer: the fake server, whose connected attribute can be set to False to
+        make Redis unavailable
+    """
+
+    class Connection(fakeredis.FakeRedisConnection):
+        def send_packed_command(self, *args, **kwargs):
+            time.sleep(latency)
+            return super().send_packed_command(*args, **kwargs)
+
+    class AsyncConnection(fakeredis.FakeAsyncRedisConnection):
+        async def send_packed_command(self, *args, **kwargs):
+            await asyncio.sleep(latency)
+            return await super().send_packed_command(*args, **kwargs)
+
+    server = fakeredis.FakeServer()
+    pools = [
+        (redis_pool.pool, Connection),
+        (redis_pool.async_pool, AsyncConnection),
+    ]
+    saved = [(pool.connection_class, pool.connection_kwargs) for pool, _ in pools]
+    for pool, connection_class in pools:
+        pool.connection_class = connection_class
+        pool.connection_kwargs = {**pool.connection_kwargs, "server": server}
+        pool.reset()
+    try:
+        with override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                    "OPTIONS": {"MAX_ENTRIES": 100_000},
+                }
+            }
+        ):
+            yield server
+    finally:
+        for (pool, _), (connection_class, kwargs) in zip(pools, saved):
+            pool.connection_class = connection_class
+            pool.connection_kwargs = kwargs
+            pool.reset()
+
+
+def create_images(user, count, size=(600, 400)):
+    """create_images bookmarks count generated images for a user.
+
+    Args:
+        user (object): User instance of the owner
+        count (int): number of images
+        size (tuple, optional): width and height. Defaults to (600, 400).
+
+    Returns:
+        list: the Image objects
+    """
+    images = []
+    for i in range(count):
+        buffer = io.BytesIO()
+        PILImage.new("RGB", size, (i * 37 % 256, i * 91 % 256, 128)).save(
+            buffer, "JPEG"
+        )
+        image = Image(user=user, title=f"Image {i}", url=f"https://example.com/{i}.jpg")
+        image.image.save(f"image-{i}.jpg", ContentFile(buffer.getvalue()), save=False)
+        image.save()
+        images.append(image)
+    return images
+
+
+class QueryCounter:
+    """QueryCounter is a database execute wrapper that counts the queries run."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(func, args_list):
+    """measure calls func once per item of args_list and times every call.
+
+    Args:
+        func (callable): the function being measured
+        args_list (list): the positional arguments of every call
+
+    Returns:
+        dict: calls, mean, p50, p95 and max latencies in milliseconds, and queries per
+        call
+    """
+    counter = QueryCounter()
+    timings = np.empty(len(args_list))
+    with connection.execute_wrapper(counter):
+        for i, args in enumerate(args_list):
+            started = time.perf_counter()
+            func(*args)
+            timings[i] = time.perf_counter() - started
+    return summarize(timings * 1000, counter.count / max(len(args_list), 1))
+
+
+def measure_memory(func, args_list):
+    """measure_memory calls func once per item of args_list and traces the memory every
+    call allocates. Tracing slows the calls down, so it is kept apart from measure.
+
+    Args:
+        func (callable): the function being measured
+        args_list (list): the positional arguments of every call
+
+    Returns:
+        float: median of the peak memory allocated by a call, in KiB
+    """
+    peaks = np.zeros(max(len(args_list), 1))
+    tracemalloc.start()
+    try:
+        for i, args in enumerate(args_list):
+            tracemalloc.reset_peak()
+            allocated, _ = tracemalloc.get_traced_memory()
+            func(*args)
+            peaks[i] = tracemalloc.get_traced_memory()[1] - allocated
+    finally:
+        tracemalloc.stop()
+    return float(np.median(peaks)) / 1024
+
+
+def summarize(milliseconds, queries=None):
+    """summarize reduces latencies to the statistics the benchmarks report.
+
+    Args:
+        milliseconds (ndarray): latency of every call, in milliseconds
+        queries (float, optional): queries per call. Defaults to None.
+
+    Returns:
+        dict: calls, mean, p50, p95 and max latencies, and queries per call
+    """
+    milliseconds = np.asarray(milliseconds)
+    if not len(milliseconds):
+        milliseconds = np.zeros(1)
+    p50, p95 = np.percentile(milliseconds, [50, 95])
+    return {
+        "calls": len(milliseconds),
+        "mean_ms": float(milliseconds.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "max_ms": float(milliseconds.max()),
+        "queries": queries,
+    }
+
+
+def format_row(name, stats):
+    """format_row formats the statistics of one benchmark as a line of a report."""
+    queries = "" if stats["queries"] is None else f"{stats['queries']:>8.2f}"
+    return (
+        f"{name:<40}{stats['calls']:>8}{stats['mean_ms']:>10.3f}"
+        f"{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['max_ms']:>10.3f}"
+        f"{queries}"
+    )
+
+
+def format_header():
+    """format_header formats the column titles of a report made of format_row lines."""
+    return (
+        f"{'benchmark':<40}{'calls':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'max ms':>10}{'queries':>8}"
+    )
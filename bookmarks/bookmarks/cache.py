@@ -0,0 +1,232 @@
+"""
+Versioned keys for the cached fragments of the image and profile pages.
+
+Every cached fragment varies on the version of the objects it shows, such as
+("image", image.id). The signal receivers of account and images bump those versions
+when the objects change, so the fragments are never invalidated one by one: their old
+keys are just not read anymore, and expire. A version is the time of the last change of
+its object, in nanoseconds, so a version that was evicted from the cache never comes
+back with a value that was used before.
+
+The {% fragment %} template tag of images records the hits and misses of every
+fragment, and how much rendering time the hits saved, for the fragment_stats management
+command. A list page renders a fragment per image, so during a request the cache reads
+and the stats are batched by FragmentCacheMiddleware: attach_versions registers the
+image_tile fragments the page is going to render, which the first of them reads with a
+single get_many, and the stats of the request are written with a single Redis pipeline
+once the response is rendered. Nothing is read for the responses that end up as a 304.
+"""
+
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from bookmarks.redis_pool import r
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.utils.deprecation import MiddlewareMixin
+
+VERSION_KEY = "version:{}:{}"
+STATS_KEY = "fragments:stats:{}"
+# every fragment whose stats were recorded
+STATS_NAMES_KEY = "fragments:stats"
+# fragment of every image in images/image/list_images.html
+IMAGE_TILE_FRAGMENT = "image_tile"
+
+
+class FragmentState:
+    """FragmentState is the fragment cache reads and stats of the current request."""
+
+    def __init__(self):
+        # keys of the fragments expected to be rendered, not read yet
+        self.expected = set()
+        # the read fragments, None for those missing from the cache
+        self.prefetched = {}
+        self.stats = []
+
+
+_state = ContextVar("fragment_state", default=None)
+
+
+def get_versions(*objects):
+    """get_versions reads the current version of several objects at once.
+
+    Args:
+        objects (tuple): (kind, id) pairs, such as ("image", 1) or ("image", "list")
+
+    Returns:
+        dict: the version of every pair
+    """
+    keys = {VERSION_KEY.format(kind, id): (kind, id) for kind, id in objects}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for key, pair in keys.items():
+        if key not in found:
+            version = time.time_ns()
+            if not cache.add(key, version, None):
+                # set by another request in the meantime
+                version = cache.get(key, version)
+            versions[pair] = version
+    return versions
+
+
+def bump_version(kind, id):
+    """bump_version changes the version of an object to the current time, so that the
+    fragments that show it are rendered again.
+
+    Args:
+        kind (string): kind of object, such as "image" or "profile"
+        id (object): id of the object
+    """
+    key = VERSION_KEY.format(kind, id)
+    # always move forward, even if two changes happen within the clock resolution
+    cache.set(key, max(time.time_ns(), cache.get(key, 0) + 1), None)
+
+
+def attach_versions(images, *objects):
+    """attach_versions reads the versions of a list of images, and of other objects,
+    with a single cache query. Every image gets a cache_version attribute, which
+    images/image/list_images.html varies on.
+
+    Args:
+        images (iterable): Image objects
+        objects (tuple): other (kind, id) pairs to read
+
+    Returns:
+        dict: the versions of the other objects
+    """
+    images = list(images)
+    versions = get_versions(*objects, *(("image", image.id) for image in images))
+    for image in images:
+        image.cache_version = versions[("image", image.id)]
+    expect_fragments(
+        IMAGE_TILE_FRAGMENT, [(image.id, image.cache_version) for image in images]
+    )
+    return versions
+
+
+def expect_fragments(name, vary_ons):
+    """expect_fragments registers fragments the current request is going to render, so
+    that they are read from the cache together by the first of them. It does nothing
+    outside FragmentCacheMiddleware.
+
+    Args:
+        name (string): name of the fragments
+        vary_ons (list): the values every fragment varies on, in order
+    """
+    state = _state.get()
+    if state is not None:
+        state.expected.update(
+            make_template_fragment_key(name, vary_on) for vary_on in vary_ons
+        )
+
+
+def get_fragment(key):
+    """get_fragment reads a cached fragment, along with the other expected fragments
+    of the request if it is one of them.
+
+    Args:
+        key (string): cache key of the fragment
+
+    Returns:
+        object: the cached value, or None
+    """
+    state = _state.get()
+    if state is None:
+        return cache.get(key)
+    if key in state.expected:
+        found = cache.get_many(state.expected)
+        state.prefetched.update(
+            {expected: found.get(expected) for expected in state.expected}
+        )
+        state.expected.clear()
+    if key in state.prefetched:
+        return state.prefetched.pop(key)
+    return cache.get(key)
+
+
+def record_fragment(name, hit, seconds):
+    """record_fragment counts a read of a cached fragment. During a request, it is only
+    written by flush_fragment_stats.
+
+    Args:
+        name (string): name of the fragment
+        hit (bool): whether it was found in the cache
+        seconds (float): rendering time of the fragment, saved if it was a hit
+    """
+    state = _state.get()
+    if state is not None:
+        state.stats.append((name, hit, seconds))
+    else:
+        write_fragment_stats([(name, hit, seconds)])
+
+
+def write_fragment_stats(stats):
+    """write_fragment_stats adds up reads of cached fragments, and writes them with a
+    single Redis pipeline.
+
+    Args:
+        stats (list): name, hit and seconds of every read, as for record_fragment
+    """
+    totals = defaultdict(lambda: defaultdict(float))
+    for name, hit, seconds in stats:
+        totals[name]["hits" if hit else "misses"] += 1
+        totals[name]["saved_seconds" if hit else "render_seconds"] += seconds
+    pipeline = r.pipeline(transaction=False)
+    pipeline.sadd(STATS_NAMES_KEY, *totals)
+    for name, fields in totals.items():
+        key = STATS_KEY.format(name)
+        for field, value in fields.items():
+            if field in ("hits", "misses"):
+                pipeline.hincrby(key, field, int(value))
+            else:
+                pipeline.hincrbyfloat(key, field, value)
+    pipeline.execute()
+
+
+class FragmentCacheMiddleware(MiddlewareMixin):
+    """FragmentCacheMiddleware batches the fragment cache reads of every request, and
+    writes their stats once the response is rendered.
+    """
+
+    def process_request(self, request):
+        _state.set(FragmentState())
+
+    def process_response(self, request, response):
+        state = _state.get()
+        # WSGI threads serve one request after another in the same context
+        _state.set(None)
+        if state is not None and state.stats:
+            write_fragment_stats(state.stats)
+        return response
+
+
+def get_fragment_stats():
+    """get_fragment_stats reads the recorded stats of every fragment.
+
+    Returns:
+        dict: hits, misses, hit_ratio, render_seconds and saved_seconds by fragment name
+    """
+    names = sorted(name.decode() for name in r.smembers(STATS_NAMES_KEY))
+    pipeline = r.pipeline(transaction=False)
+    for name in names:
+        pipeline.hgetall(STATS_KEY.format(name))
+    stats = {}
+    for name, values in zip(names, pipeline.execute()):
+        values = {field.decode(): float(value) for field, value in values.items()}
+        hits = int(values.get("hits", 0))
+        misses = int(values.get("misses", 0))
+        stats[name] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+            "render_seconds": values.get("render_seconds", 0.0),
+            "saved_seconds": values.get("saved_seconds", 0.0),
+        }
+    return stats
+
+
+def reset_fragment_stats():
+    """reset_fragment_stats forgets the recorded stats of every fragment."""
+    names = [name.decode() for name in r.smembers(STATS_NAMES_KEY)]
+    r.delete(STATS_NAMES_KEY, *(STATS_KEY.format(name) for name in names))
@@ -0,0 +1,84 @@
+"""
+Conditional GET support for the image and profile pages.
+
+The views compute an ETag from what their page shows: the versions of bookmarks.cache,
+the like counts, and the state of the logged-in user. That is cheap compared to
+rendering the page, so a client or CDN that already has the current page gets a 304 Not
+Modified response without any rendering.
+
+There is no Last-Modified date. The most recent version of a page misses changes that
+the ETag covers, such as an older image moving onto a list page after a deletion, or
+another user or CSRF secret, so a client revalidating with If-Modified-Since alone
+could get a 304 for a page that changed.
+
+base.html also shows a CSRF token, in the logout form, and the pending messages. The
+CSRF secret, which is rotated on login, is part of every ETag, and pages that show
+messages are always rendered and never validated, since the messages are only shown
+once.
+"""
+
+import hashlib
+
+from django.contrib import messages
+from django.middleware.csrf import get_token
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import quote_etag
+
+
+def make_etag(request, *parts):
+    """make_etag builds a strong ETag from everything a page depends on. The user
+    shown in the header of base.html and the CSRF secret of its logout form are always
+    part of it.
+
+    Args:
+        request (HttpRequest): the current request
+        parts (tuple): values whose repr identifies the content of the page
+
+    Returns:
+        string: quoted ETag
+    """
+    user = request.user
+    if user.is_authenticated:
+        # the secret of the token of the logout form, set now if the client has none
+        get_token(request)
+        parts += (user.id, user.username, user.first_name, request.META["CSRF_COOKIE"])
+    digest = hashlib.sha1(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return quote_etag(digest)
+
+
+def conditional(request, etag, render):
+    """conditional returns 304 Not Modified when the client already has the page,
+    like the condition decorator, and calls render to build the page otherwise. Both
+    responses carry the validators and headers that keep shared caches from mixing up
+    the pages of logged-in users with the public ones.
+
+    Args:
+        request (HttpRequest): the current request
+        etag (string): ETag of the current page
+        render (callable): builds the response when the page must be sent
+
+    Returns:
+        HttpResponse: the 304 response or the rendered page
+    """
+    if len(messages.get_messages(request)):
+        # the page shows the messages once: no 304, and nothing to revalidate later
+        etag = None
+    response = None
+    if etag:
+        response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = render()
+    if request.method in ("GET", "HEAD"):
+        if etag and not response.has_header("ETag"):
+            response.headers["ETag"] = etag
+        patch_vary_headers(response, ["Cookie"])
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            # shared caches may keep the page, but must revalidate it every time
+            patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
@@ -0,0 +1,216 @@
+"""
+Serving of the uploaded files of MEDIA_ROOT: image originals, their thumbnails and
+profile photos.
+
+serve_media checks that the file may be served, then hands it off to the web server in
+front with X-Accel-Redirect (nginx) or X-Sendfile (Apache, lighttpd), according to
+MEDIA_SENDFILE, so that Python never reads the bytes. Without a front server, it streams
+the file itself with FileResponse, with ETags, conditional requests and single byte
+ranges. WSGI servers such as gunicorn send such responses with sendfile(), from the
+position of the file and for its Content-Length.
+
+nginx needs an internal location for MEDIA_ACCEL_PREFIX, such as:
+
+    location /protected-media/ {
+        internal;
+        alias /path/to/bookmarks/media/;
+    }
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+# bytes read at a time when streaming from Python
+BLOCK_SIZE = 256 * 1024
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class FileRange:
+    """FileRange is a file limited to length bytes from its current position. It keeps
+    the fileno() and tell() of the file, which servers use to send it with sendfile().
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def seekable(self):
+        # FileResponse would take the size of the whole file
+        return False
+
+    def close(self):
+        self.file.close()
+
+
+def can_access(request, path):
+    """can_access tells whether a file of MEDIA_ROOT may be served to the request. Only
+    the upload directories of MEDIA_ALLOWED_DIRS are served, never hidden files.
+
+    Args:
+        request (HttpRequest): the current request
+        path (string): name of the file, relative to MEDIA_ROOT
+
+    Returns:
+        bool: whether the file may be served
+    """
+    if any(part.startswith(".") for part in path.split("/")):
+        return False
+    return path.startswith(tuple(settings.MEDIA_ALLOWED_DIRS))
+
+
+def parse_range(header, size):
+    """parse_range reads a Range header asking for a single byte range.
+
+    Args:
+        header (string): the Range header
+        size (int): size of the file
+
+    Returns:
+        tuple: first and last byte of the range, None to send the whole file, or
+        (None, None) if the range can't be satisfied
+    """
+    match = RANGE_RE.match(header.replace(" ", ""))
+    if match is None:
+        # several ranges, or another unit: the whole file is a valid answer
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # the last bytes of the file
+        first, last = max(size - int(last), 0), size - 1
+    else:
+        first = int(first)
+        last = min(int(last), size - 1) if last else size - 1
+    if first >= size or first > last:
+        return None, None
+    return first, last
+
+
+@require_safe
+def serve_media(request, path):
+    """serve_media serves a file of MEDIA_ROOT, through the front server when there is
+    one.
+
+    Args:
+        request (GET): the request for the file, maybe for a byte range
+        path (string): name of the file, relative to MEDIA_ROOT
+
+    Returns:
+        HttpResponse: the file, part of it, a handoff to the front server, or 304 Not
+        Modified
+    """
+    if not can_access(request, path):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except ValueError:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    content_type, _ = mimetypes.guess_type(path)
+    content_type = content_type or "application/octet-stream"
+    etag = quote_etag(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None and settings.MEDIA_SENDFILE:
+        response = hand_off(path, full_path, content_type)
+    elif response is None:
+        byte_range = None
+        if "Range" in request.headers and range_applies(request, etag, last_modified):
+            byte_range = parse_range(request.headers["Range"], stat.st_size)
+        response = stream_file(full_path, stat.st_size, content_type, byte_range)
+        response.headers["Accept-Ranges"] = "bytes"
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=settings.MEDIA_MAX_AGE)
+    return response
+
+
+def hand_off(path, full_path, content_type):
+    """hand_off returns an empty response telling the front server to send the file
+    itself, which also handles its byte ranges.
+
+    Args:
+        path (string): name of the file, relative to MEDIA_ROOT
+        full_path (string): path of the file
+        content_type (string): Content-Type of the response
+
+    Returns:
+        HttpResponse: response with X-Accel-Redirect or X-Sendfile
+    """
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_SENDFILE == "nginx":
+        response.headers["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+    else:
+        response.headers["X-Sendfile"] = full_path
+    return response
+
+
+def stream_file(full_path, size, content_type, byte_range=None):
+    """stream_file streams a file from Python, or a byte range of it.
+
+    Args:
+        full_path (string): path of the file
+        size (int): size of the file
+        content_type (string): Content-Type of the response
+        byte_range (tuple, optional): range from parse_range. Defaults to None, the
+            whole file.
+
+    Returns:
+        HttpResponse: 200 or 206 FileResponse, or 416 if the range can't be satisfied
+    """
+    if byte_range == (None, None):
+        response = HttpResponse(status=416)
+        response.headers["Content-Range"] = f"bytes */{size}"
+        return response
+    file = open(full_path, "rb")
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        first, last = byte_range
+        file.seek(first)
+        response = FileResponse(
+            FileRange(file, last - first + 1), content_type=content_type, status=206
+        )
+        response.headers["Content-Length"] = last - first + 1
+        response.headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    response.block_size = BLOCK_SIZE
+    return response
+
+
+def range_applies(request, etag, last_modified):
+    """range_applies tells whether the Range header of a request applies, according to
+    its If-Range header: the client only wants part of the version it already has.
+    """
+    if_range = request.headers.get("If-Range")
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
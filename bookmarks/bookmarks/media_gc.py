@@ -0,0 +1,156 @@
+"""
+Garbage collection of the uploaded files of MEDIA_ROOT that no row refers to anymore.
+
+Deleting an image, or replacing the photo of a profile, leaves the original file and
+its easy-thumbnails derivatives, such as photo.jpg.80x80_q85_crop-100%.jpg, next to it
+in storage. collect_garbage walks the directories of MEDIA_ALLOWED_DIRS one at a time
+and deletes every file that is neither referenced by an ImageField nor a thumbnail of a
+referenced file.
+
+The referenced names are copied from the database with .iterator() into a temporary
+SQLite database on disk, so neither they nor the tree are ever held in memory. Files
+modified during the grace period are kept: an upload is saved to storage before the
+row that refers to it is committed.
+"""
+
+import os
+import re
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from easy_thumbnails.models import Source
+
+# the ImageFields whose files are kept
+REFERENCES = [("images.Image", "image"), ("account.Profile", "photo")]
+# names of the thumbnails of the default easy-thumbnails namer: source.opts.extension
+THUMBNAIL_RE = re.compile(r"^(?P<source>.+)\.\d+x\d+(?:_[^/]*)?\.\w+$")
+# names read from the database, and files deleted, at a time
+BATCH_SIZE = 1000
+
+
+class ReferenceSet:
+    """ReferenceSet is a set of file names kept in a temporary SQLite database."""
+
+    def __init__(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db = sqlite3.connect(os.path.join(self.directory.name, "references.db"))
+        self.db.execute("CREATE TABLE reference (name TEXT PRIMARY KEY) WITHOUT ROWID")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.db.close()
+        self.directory.cleanup()
+
+    def __contains__(self, name):
+        query = "SELECT 1 FROM reference WHERE name = ?"
+        return self.db.execute(query, (name,)).fetchone() is not None
+
+    def update(self, names):
+        batch = []
+        for name in names:
+            batch.append((name,))
+            if len(batch) == BATCH_SIZE:
+                self.insert(batch)
+                batch = []
+        self.insert(batch)
+
+    def insert(self, batch):
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO reference VALUES (?)", batch)
+
+
+def referenced_names():
+    """referenced_names yields the names of the files of the REFERENCES fields."""
+    for label, field in REFERENCES:
+        model = apps.get_model(label)
+        names = (
+            model._default_manager.using("default")
+            .exclude(**{field: ""})
+            .values_list(field, flat=True)
+        )
+        yield from names.iterator(chunk_size=BATCH_SIZE)
+
+
+def walk(storage, directory):
+    """walk yields the names of the files under a directory of the storage, skipping
+    hidden files and directories.
+    """
+    directories, files = storage.listdir(directory)
+    for name in sorted(files):
+        if not name.startswith("."):
+            yield f"{directory}/{name}"
+    for name in sorted(directories):
+        if not name.startswith("."):
+            yield from walk(storage, f"{directory}/{name}")
+
+
+def find_garbage(storage, references, grace):
+    """find_garbage yields the files of MEDIA_ALLOWED_DIRS that are not referenced.
+
+    Args:
+        storage (Storage): storage of the uploaded files
+        references (ReferenceSet): names of the referenced files
+        grace (timedelta): files modified since are kept
+
+    Yields:
+        tuple: name of the file, and whether it is a thumbnail
+    """
+    cutoff = timezone.now() - grace
+    for directory in settings.MEDIA_ALLOWED_DIRS:
+        directory = directory.rstrip("/")
+        if not storage.exists(directory):
+            continue
+        for name in walk(storage, directory):
+            if name in references:
+                continue
+            match = THUMBNAIL_RE.match(name)
+            if match and match["source"] in references:
+                continue
+            if storage.get_modified_time(name) > cutoff:
+                continue
+            yield name, match is not None
+
+
+def collect_garbage(grace=timedelta(days=1), dry_run=False, workers=8):
+    """collect_garbage deletes the unreferenced files of MEDIA_ALLOWED_DIRS, several at
+    a time, and the easy-thumbnails records of the deleted originals.
+
+    Args:
+        grace (timedelta, optional): files modified since are kept. Defaults to a day.
+        dry_run (bool, optional): only list the files. Defaults to False.
+        workers (int, optional): files deleted at the same time. Defaults to 8.
+
+    Yields:
+        tuple: name of every deleted file, its size, and whether it is a thumbnail
+    """
+    storage = default_storage
+
+    def delete(name):
+        try:
+            size = storage.size(name)
+            if not dry_run:
+                storage.delete(name)
+        except FileNotFoundError:
+            # deleted in the meantime
+            return 0
+        return size
+
+    with ReferenceSet() as references, ThreadPoolExecutor(workers) as executor:
+        references.update(referenced_names())
+        garbage = find_garbage(storage, references, grace)
+        while batch := [item for _, item in zip(range(BATCH_SIZE), garbage)]:
+            sizes = executor.map(delete, [name for name, _ in batch])
+            for (name, thumbnail), size in zip(batch, sizes):
+                yield name, size, thumbnail
+            originals = [name for name, thumbnail in batch if not thumbnail]
+            if originals and not dry_run:
+                # their thumbnail records, which would point to deleted files
+                Source.objects.filter(name__in=originals).delete()
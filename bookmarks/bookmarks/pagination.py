@@ -0,0 +1,136 @@
+"""
+Keyset (cursor) pagination shared by the project's list views.
+
+OFFSET pagination makes the database walk past every skipped row, so deep pages get
+slower as tables grow. Keyset pagination remembers the sort key of the last row shown
+and asks for the rows after it, which an index on the sort key answers directly. The
+ordering must be unique, e.g. ["-created", "-id"].
+"""
+
+import base64
+import binascii
+import json
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    """encode_cursor packs the sort key values of a row into an opaque, URL safe string.
+
+    Args:
+        values (list): values of the ordering fields. Datetimes are stored with str(),
+        which keeps their microseconds and is parsed back by the model fields.
+
+    Returns:
+        string: the cursor
+    """
+    data = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor):
+    """decode_cursor unpacks a cursor made by encode_cursor.
+
+    Args:
+        cursor (string): the cursor sent by the client
+
+    Returns:
+        list: the sort key values, or None if the cursor is missing or malformed
+    """
+    if not cursor:
+        return None
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(data)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def clean_cursor(model, ordering, values):
+    """clean_cursor converts the values of a decoded cursor with the ordering fields of
+    the model, so a tampered cursor can't reach the database.
+
+    Args:
+        model (Model): model of the paginated rows
+        ordering (list): field names, prefixed with "-" for descending order
+        values (list): values of the cursor
+
+    Returns:
+        list: the converted values, or None if they don't fit the fields
+    """
+    if values is None or len(values) != len(ordering):
+        return None
+    cleaned = []
+    for field, value in zip(ordering, values):
+        opts = model._meta
+        for name in field.lstrip("-").split("__"):
+            model_field = opts.get_field(name)
+            if model_field.related_model is not None:
+                opts = model_field.related_model._meta
+        try:
+            value = model_field.to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            return None
+        if value is None:
+            return None
+        cleaned.append(value)
+    return cleaned
+
+
+def keyset_filter(ordering, values):
+    """keyset_filter builds the condition matching the rows that come after the given
+    sort key, i.e. the row-value comparison (a, b) > (x, y) written out as
+    a > x OR (a = x AND b > y), with the direction of each field respected.
+
+    Args:
+        ordering (list): field names, prefixed with "-" for descending order
+        values (list): sort key of the last row of the previous page
+
+    Returns:
+        Q: filter for the rows of the next page
+    """
+    clauses = []
+    for position, field in enumerate(ordering):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        clause = Q(**{f"{name}__{lookup}": values[position]})
+        for previous, value in zip(ordering[:position], values):
+            clause &= Q(**{previous.lstrip("-"): value})
+        clauses.append(clause)
+    return reduce(lambda a, b: a | b, clauses)
+
+
+def paginate_keyset(queryset, ordering, cursor=None, per_page=10):
+    """paginate_keyset returns one page of a queryset and the cursor of the next page.
+    One extra row is fetched to know whether there is a next page, so no COUNT query is
+    needed.
+
+    Args:
+        queryset (QuerySet): rows to paginate
+        ordering (list): unique ordering, e.g. ["-created", "-id"]
+        cursor (string, optional): cursor of the page to return. Defaults to None, which
+        returns the first page; malformed cursors also return the first page.
+        per_page (int, optional): rows per page. Defaults to 10.
+
+    Returns:
+        tuple: list of rows, and the cursor of the next page or None on the last page
+    """
+    queryset = queryset.order_by(*ordering)
+    values = clean_cursor(queryset.model, ordering, decode_cursor(cursor))
+    if values is not None:
+        queryset = queryset.filter(keyset_filter(ordering, values))
+    items = list(queryset[: per_page + 1])
+    if len(items) <= per_page:
+        return items, None
+    items = items[:per_page]
+    last = items[-1]
+    return items, encode_cursor([_value(last, field) for field in ordering])
+
+
+def _value(obj, field):
+    for attr in field.lstrip("-").split("__"):
+        obj = getattr(obj, attr)
+    return obj
@@ -0,0 +1,28 @@
+"""
+Shared Redis connection for the project.
+
+Every module that talks to Redis uses the client defined here, so they share a single
+connection pool per process instead of opening their own connections. Async views use
+the asyncio client "ar" instead, whose pool belongs to the event loop of the ASGI
+server.
+"""
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+pool = redis.ConnectionPool(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    db=settings.REDIS_DB,
+)
+
+r = redis.Redis(connection_pool=pool)
+
+async_pool = redis.asyncio.ConnectionPool(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    db=settings.REDIS_DB,
+)
+
+ar = redis.asyncio.Redis(connection_pool=async_pool)
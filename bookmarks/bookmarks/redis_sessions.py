@@ -0,0 +1,148 @@
+"""
+Session engine storing sessions in Redis, through the shared connection pool of
+bookmarks.redis_pool.
+
+Loading a session is a single Redis round trip, instead of a SELECT on django_session
+for every request. Saving only writes when the data of the session actually changed:
+SessionMiddleware saves sessions that were merely marked as modified, such as on login
+or when messages are read. Expiry slides: the session is written again, which also
+renews the session cookie, once it was last written more than SESSION_REFRESH_INTERVAL
+seconds ago, so active users stay logged in at the cost of one write per interval.
+
+When Redis is unavailable, sessions are read from and written to the database, like
+with the db engine; account.user_cache then reads request.user from the database too. A
+session that isn't in Redis is looked up in the database before it is given up, and
+moved to Redis when found, so the sessions saved during an outage, and those of the db
+engine before switching to this one, stay logged in.
+"""
+
+import logging
+
+import redis
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError, SessionBase
+from django.contrib.sessions.backends.db import SessionStore as DBSessionStore
+
+from .redis_pool import r
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "session:"
+
+
+class SessionStore(SessionBase):
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        # serialized data of the session when it was loaded or last saved
+        self._saved = None
+        self._refresh = False
+        # whether the session was loaded from the database, and is moved to Redis
+        self._from_db = False
+
+    @property
+    def cache_key(self):
+        return KEY_PREFIX + self._get_or_create_session_key()
+
+    def load(self):
+        if self.session_key is None:
+            return {}
+        try:
+            pipeline = r.pipeline(transaction=False)
+            pipeline.get(KEY_PREFIX + self.session_key)
+            pipeline.ttl(KEY_PREFIX + self.session_key)
+            data, ttl = pipeline.execute()
+        except redis.RedisError:
+            logger.warning(
+                "Redis is unavailable, loading the session from the database"
+            )
+            return self.load_from_db()
+        if data is None:
+            session = self.load_from_db()
+            if self.session_key is not None:
+                # SessionMiddleware saves it to Redis
+                self._from_db = self._refresh = self.modified = True
+            return session
+        session = self.decode(data.decode())
+        self._saved = self.serializer().dumps(session)
+        age = self.get_expiry_age(expiry=session.get("_session_expiry"))
+        if ttl > 0 and age - ttl > settings.SESSION_REFRESH_INTERVAL:
+            # SessionMiddleware saves it, and sets the cookie again
+            self._refresh = self.modified = True
+        return session
+
+    def load_from_db(self):
+        """load_from_db loads the session from the database, and forgets its key if it
+        isn't there.
+        """
+        store = DBSessionStore(self.session_key)
+        session = store.load()
+        self._session_key = store.session_key
+        return session
+
+    def exists(self, session_key):
+        try:
+            return bool(r.exists(KEY_PREFIX + session_key))
+        except redis.RedisError:
+            return DBSessionStore().exists(session_key)
+
+    def create(self):
+        while True:
+            self._session_key = self._get_new_session_key()
+            try:
+                self.save(must_create=True)
+            except CreateError:
+                # the key is taken
+                continue
+            self.modified = True
+            return
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        session = self._get_session(no_load=must_create)
+        serialized = self.serializer().dumps(session)
+        if not must_create and not self._refresh and serialized == self._saved:
+            return
+        expiry_age = self.get_expiry_age()
+        if expiry_age <= 0:
+            # Redis refuses a non-positive expiry, and the session is over anyway
+            self.delete()
+            return
+        try:
+            saved = r.set(
+                self.cache_key,
+                self.encode(session),
+                ex=expiry_age,
+                nx=must_create,
+            )
+        except redis.RedisError:
+            logger.warning("Redis is unavailable, saving the session to the database")
+            store = DBSessionStore(self.session_key)
+            store._session_cache = session
+            store.save(must_create=must_create)
+            saved = True
+        else:
+            if self._from_db:
+                DBSessionStore().delete(self.session_key)
+                self._from_db = False
+        if must_create and not saved:
+            raise CreateError
+        self._saved = serialized
+        self._refresh = False
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        try:
+            r.delete(KEY_PREFIX + session_key)
+        except redis.RedisError:
+            pass
+        # it may have been saved there while Redis was unavailable
+        DBSessionStore().delete(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        # Redis expires the sessions by itself, the database ones are those of outages
+        DBSessionStore.clear_expired()
@@ -0,0 +1,130 @@
+"""
+Primary/replica database routing.
+
+Writes always go to the primary, the default database. During a request, reads go to
+one of the DATABASE_REPLICAS aliases, picked at random for the whole request. Requests
+that write are pinned to the primary for the rest of the request, and
+ReplicaRoutingMiddleware sets a cookie that keeps the next requests of the same client
+on the primary for REPLICA_PIN_SECONDS, so users read their own writes while the
+replicas catch up. Unsafe requests, such as POST, read from the primary from the start,
+so that forms are validated against current data.
+
+Outside requests, in management commands and the shell, everything uses the primary.
+
+For local testing, the replicas can be SQLite copies of the primary database, made by
+the sync_replicas management command of images.
+"""
+
+import random
+import sqlite3
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+
+PIN_COOKIE_NAME = "pin_primary"
+# apps whose reads must see every write: sessions are read right after being created
+PRIMARY_APPS = {"sessions"}
+
+
+class RoutingState:
+    """RoutingState is the database routing of the current request."""
+
+    def __init__(self, replica, pinned):
+        self.replica = replica
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = ContextVar("routing_state", default=None)
+
+
+class PrimaryReplicaRouter:
+    """PrimaryReplicaRouter sends writes to the primary and the reads of requests to a
+    replica, unless the request is pinned to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None
+            or state.pinned
+            or state.replica is None
+            or model._meta.app_label in PRIMARY_APPS
+        ):
+            return "default"
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.app_label not in PRIMARY_APPS:
+            state.pinned = state.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get their schema from the primary
+        return db == "default"
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """ReplicaRoutingMiddleware sets the routing state of every request, and the cookie
+    that pins a client to the primary after a write.
+    """
+
+    def process_request(self, request):
+        replicas = settings.DATABASE_REPLICAS
+        _state.set(
+            RoutingState(
+                replica=random.choice(replicas) if replicas else None,
+                pinned=request.method not in ("GET", "HEAD", "OPTIONS")
+                or PIN_COOKIE_NAME in request.COOKIES,
+            )
+        )
+
+    def process_response(self, request, response):
+        state = _state.get()
+        if state is not None and state.wrote and settings.REPLICA_PIN_SECONDS:
+            response.set_cookie(
+                PIN_COOKIE_NAME,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        # WSGI threads serve one request after another in the same context
+        _state.set(None)
+        return response
+
+
+def sync_replicas(aliases=None):
+    """sync_replicas copies the primary SQLite database over its SQLite replicas, with
+    the online backup API of SQLite, so the copies are consistent even while the
+    primary is being written to.
+
+    Args:
+        aliases (list, optional): replicas to copy to. Defaults to DATABASE_REPLICAS.
+
+    Returns:
+        list: the aliases that were copied to
+    """
+    primary = connections["default"]
+    if primary.vendor != "sqlite":
+        raise ValueError("sync_replicas only copies SQLite databases")
+    primary.ensure_connection()
+    synced = []
+    for alias in settings.DATABASE_REPLICAS if aliases is None else aliases:
+        replica = connections[alias]
+        # the copy replaces the file of the replica, whose connection must be reopened
+        replica.close()
+        target = sqlite3.connect(replica.settings_dict["NAME"])
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        synced.append(alias)
+    return synced
@@ -25,6 +25,10 @@ DEBUG = True
 
 ALLOWED_HOSTS = ["mysite.com", "localhost", "127.0.0.1"]
 
+# bookmarks/asgi.py sets DJANGO_ASGI; the debug toolbar middleware is sync-only, and
+#   Django would run the whole middleware chain and the async views in a thread for it
+DEBUG_TOOLBAR = DEBUG and not config("DJANGO_ASGI", default=False, cast=bool)
+
 
 # Application definition
 
@@ -39,7 +43,6 @@ INSTALLED_APPS = [
     # admindocs
     "django.contrib.admindocs",
     # third-party applications
-    "debug_toolbar",
     "django_extensions",
     "easy_thumbnails",
     "social_django",
@@ -47,20 +50,30 @@ INSTALLED_APPS = [
     "actions.apps.ActionsConfig",  # provides actions for project
     "images.apps.ImagesConfig",  # manages the images for project
 ]
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append("debug_toolbar")
 
 MIDDLEWARE = [
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    # sends the reads of requests to the replicas of DATABASE_REPLICAS
+    "bookmarks.routers.ReplicaRoutingMiddleware",
+    # batches the reads and stats of the {% fragment %} blocks of every request
+    "bookmarks.cache.FragmentCacheMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # AuthenticationMiddleware, with request.user read from the user context cache
+    "account.middleware.CachedAuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django.contrib.admindocs.middleware.XViewMiddleware",
 ]
+if DEBUG_TOOLBAR:
+    MIDDLEWARE.insert(0, "debug_toolbar.middleware.DebugToolbarMiddleware")
 
-ROOT_URLCONF = "bookmarks.urls"
+# asgi.py switches to bookmarks.asgi_urls, which serves the async versions of the hot
+# views; WSGI and manage.py keep the sync ones
+ROOT_URLCONF = config("DJANGO_ROOT_URLCONF", default="bookmarks.urls")
 
 TEMPLATES = [
     {
@@ -84,13 +97,64 @@ WSGI_APPLICATION = "bookmarks.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# the tuned SQLite configuration: concurrent readers and a writer with the WAL journal,
+#   writers waiting for each other instead of failing with "database is locked", and
+#   connections kept open across requests. DJANGO_SQLITE_TUNED=False goes back to the
+#   stock configuration
+SQLITE_TUNED = config("DJANGO_SQLITE_TUNED", default=True, cast=bool)
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    # with WAL, only a power loss can lose the last transactions, never corrupt
+    "synchronous": "NORMAL",
+    # milliseconds to wait for the write lock
+    "busy_timeout": 5000,
+    "mmap_size": 128 * 1024 * 1024,
+    # negative sizes are in KiB
+    "cache_size": -20 * 1024,
+}
+if SQLITE_TUNED:
+    SQLITE_DATABASE = {
+        # django.db.backends.sqlite3 with the OPTIONS of Django 5.1
+        "ENGINE": "bookmarks.sqlite_backend",
+        "OPTIONS": {
+            "init_command": ";".join(
+                f"PRAGMA {name} = {value}" for name, value in SQLITE_PRAGMAS.items()
+            ),
+            # atomic blocks take the write lock as they begin
+            "transaction_mode": "IMMEDIATE",
+        },
+        "CONN_MAX_AGE": config("DJANGO_CONN_MAX_AGE", default=600, cast=int),
+        "CONN_HEALTH_CHECKS": True,
+    }
+else:
+    SQLITE_DATABASE = {"ENGINE": "django.db.backends.sqlite3"}
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        **SQLITE_DATABASE,
         "NAME": BASE_DIR / "db.sqlite3",
     }
 }
 
+# read replicas of the default database, used by bookmarks.routers during requests.
+#   DJANGO_DATABASE_REPLICAS=2 adds two SQLite copies of db.sqlite3 for local testing,
+#   refreshed by manage.py sync_replicas
+DATABASE_REPLICAS = [
+    f"replica{i}"
+    for i in range(1, config("DJANGO_DATABASE_REPLICAS", default=0, cast=int) + 1)
+]
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        **SQLITE_DATABASE,
+        "NAME": BASE_DIR / f"db.{alias}.sqlite3",
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["bookmarks.routers.PrimaryReplicaRouter"]
+
+# seconds a client keeps reading from the primary after a write, so they see it
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -127,6 +191,24 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.0/howto/static-files/
 
 STATIC_URL = "static/"
+# collectstatic copies the static files here, served by bookmarks.staticfiles
+STATIC_ROOT = BASE_DIR / "static"
+
+# hashed names and precompressed variants for the static files, which can then be
+#   cached for good; collectstatic must run before the server starts
+STATIC_MANIFEST = config("DJANGO_STATIC_MANIFEST", default=not DEBUG, cast=bool)
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "bookmarks.storage.CompressedManifestStaticFilesStorage"
+            if STATIC_MANIFEST
+            else "django.contrib.staticfiles.storage.StaticFilesStorage"
+        ),
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
@@ -147,6 +229,20 @@ EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 # location of media files
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# how bookmarks.media hands the files of MEDIA_ROOT off to the web server in front:
+#   "nginx" with X-Accel-Redirect, "apache" with X-Sendfile, or "" to stream them from
+#   Python
+MEDIA_SENDFILE = config("DJANGO_MEDIA_SENDFILE", default="")
+# internal nginx location that serves MEDIA_ROOT, for X-Accel-Redirect
+MEDIA_ACCEL_PREFIX = "/protected-media/"
+# directories of MEDIA_ROOT that are served: the upload_to of the image fields
+MEDIA_ALLOWED_DIRS = ["images/", "users/"]
+# seconds for which clients may cache media files without revalidating them
+MEDIA_MAX_AGE = 60 * 60 * 24
+# limits of the images uploaded from the disk of users, checked by images.uploads
+#   while the upload is received: bytes, and width times height
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 50_000_000
 
 AUTHENTICATION_BACKENDS = [
     "django.contrib.auth.backends.ModelBackend",
@@ -155,6 +251,13 @@ AUTHENTICATION_BACKENDS = [
     "social_core.backends.google.GoogleOAuth2",
 ]
 
+# seconds for which the user, profile and follows of a logged-in user are cached by
+# account.middleware.CachedAuthenticationMiddleware; signals invalidate them on change
+USER_CACHE_TIMEOUT = 5 * 60
+
+# seconds for which EmailAuthBackend remembers that an e-mail address is unknown
+EMAIL_AUTH_NEGATIVE_TIMEOUT = 60
+
 SOCIAL_AUTH_GOOGLE_OAUTH2_KEY = config("GOOGLE_OAUTH2_KEY")
 SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET = config("GOOGLE_OAUTH2_SECRET")
 
@@ -196,3 +299,36 @@ INTERNAL_IPS = [
 REDIS_HOST = "localhost"
 REDIS_PORT = 6379
 REDIS_DB = 0
+
+# the default cache is stored in the same Redis server; its keys are prefixed with
+# KEY_PREFIX and the cache version, so they don't clash with the keys used directly
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}",
+        "KEY_PREFIX": "cache",
+    }
+}
+
+# sessions are stored in the same Redis server, on the shared connection pool of
+#   bookmarks.redis_pool, and in the database while Redis is unavailable; database
+#   sessions, e.g. those of the db engine, are moved to Redis when next used
+SESSION_ENGINE = "bookmarks.redis_sessions"
+# seconds after which a session that wasn't changed is written again, extending its
+#   expiry and its cookie by SESSION_COOKIE_AGE
+SESSION_REFRESH_INTERVAL = 60 * 60
+
+# seconds for which the {% fragment %} blocks of the image and profile pages are cached.
+# They vary on the versions of bookmarks.cache, so changes show up right away
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# rendered activity stream fragments are cached per action, for ACTION_CACHE_TIMEOUT
+# seconds, and vary on the versions of its user and target in bookmarks.cache. Bump
+# ACTION_CACHE_VERSION to discard them, e.g. after changing the template
+ACTION_CACHE_TIMEOUT = 60 * 60
+ACTION_CACHE_VERSION = 1
+
+# actions older than ACTION_RETENTION_DAYS are removed by "manage.py purge_actions",
+# after being archived as compressed JSON lines under ACTION_ARCHIVE_DIR
+ACTION_RETENTION_DAYS = 180
+ACTION_ARCHIVE_DIR = BASE_DIR / "archive"
@@ -0,0 +1,123 @@
+"""
+Vectorized helpers for the batch recommendation jobs.
+
+Graphs (who follows whom, who likes what) are stored as CSR adjacency arrays: the
+neighbours of row i are indices[indptr[i]:indptr[i + 1]]. All the functions work on
+whole batches of rows with NumPy, never with Python loops over rows or edges.
+"""
+
+import numpy as np
+
+
+def dense_ids(ids):
+    """dense_ids maps database ids to consecutive row numbers.
+
+    Args:
+        ids (ndarray): database ids, possibly repeated
+
+    Returns:
+        tuple: the sorted unique ids, whose positions are the row numbers, and the row
+        number of every input id
+    """
+    unique = np.unique(ids)
+    return unique, np.searchsorted(unique, ids)
+
+
+def build_csr(rows, cols, n_rows):
+    """build_csr builds the CSR adjacency of a list of edges. Duplicate edges are kept.
+
+    Args:
+        rows (ndarray): row number of the source of every edge
+        cols (ndarray): column number of the target of every edge
+        n_rows (int): number of rows
+
+    Returns:
+        tuple: indptr (n_rows + 1 offsets) and indices (targets, sorted within a row)
+    """
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order].astype(np.int32)
+
+
+def gather_rows(indptr, indices, rows):
+    """gather_rows concatenates the neighbours of several rows.
+
+    Args:
+        indptr (ndarray): CSR offsets
+        indices (ndarray): CSR targets
+        rows (ndarray): the rows to read, repeated rows are read again
+
+    Returns:
+        tuple: the position in rows each neighbour came from, and the neighbours
+    """
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    owners = np.repeat(np.arange(len(rows)), lengths)
+    # position of every neighbour inside its row
+    offsets = np.arange(lengths.sum()) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths
+    )
+    return owners, indices[starts[owners] + offsets]
+
+
+def cost_batches(costs, max_cost):
+    """cost_batches splits rows into consecutive batches whose total cost is about
+    max_cost at most, so the memory used by a batch is bounded. A row costing more than
+    max_cost gets a batch of its own.
+
+    Args:
+        costs (ndarray): cost of every row
+        max_cost (int): budget of a batch
+
+    Yields:
+        ndarray: row numbers of a batch
+    """
+    bounds = np.cumsum(costs) // max(max_cost, 1)
+    start = 0
+    n_rows = len(costs)
+    while start < n_rows:
+        end = max(np.searchsorted(bounds, bounds[start], side="right"), start + 1)
+        yield np.arange(start, end)
+        start = end
+
+
+def count_pairs(owners, values, n_cols):
+    """count_pairs counts how many times each (owner, value) pair occurs.
+
+    Args:
+        owners (ndarray): first element of the pairs
+        values (ndarray): second element of the pairs
+        n_cols (int): upper bound of the values
+
+    Returns:
+        tuple: owners, values and counts of the distinct pairs, sorted by owner
+    """
+    keys, counts = np.unique(
+        owners.astype(np.int64) * n_cols + values, return_counts=True
+    )
+    return keys // n_cols, keys % n_cols, counts
+
+
+def top_k_per_row(rows, cols, scores, k):
+    """top_k_per_row keeps the k best scored columns of every row, ties broken by
+    column.
+
+    Args:
+        rows (ndarray): row of every candidate
+        cols (ndarray): column of every candidate
+        scores (ndarray): score of every candidate, higher is better
+        k (int): candidates kept per row
+
+    Returns:
+        tuple: rows, cols and scores of the kept candidates, each row's best first
+    """
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    positions = np.arange(len(rows))
+    is_first = np.ones(len(rows), dtype=bool)
+    is_first[1:] = rows[1:] != rows[:-1]
+    # rank of every candidate inside its row
+    ranks = positions - np.maximum.accumulate(np.where(is_first, positions, 0))
+    keep = ranks < k
+    return rows[keep], cols[keep], scores[keep]
@@ -0,0 +1,48 @@
+"""
+SQLite database backend with the init_command and transaction_mode OPTIONS of Django
+5.1, for the tuned SQLite configuration of bookmarks/settings.py.
+
+init_command holds the PRAGMA statements, separated by semicolons, run on every new
+connection. transaction_mode is how the transactions of atomic blocks begin: with
+"IMMEDIATE", they take the write lock up front, and wait for it for busy_timeout,
+instead of failing with "database is locked" when a read transaction can't be upgraded
+to a write one because another connection is writing.
+
+Once the project runs on Django 5.1, ENGINE can go back to
+django.db.backends.sqlite3 with the same OPTIONS.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = {"DEFERRED", "EXCLUSIVE", "IMMEDIATE"}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # not parameters of sqlite3.connect()
+        self.init_command = kwargs.pop("init_command", "")
+        transaction_mode = kwargs.pop("transaction_mode", None)
+        if transaction_mode is not None:
+            transaction_mode = transaction_mode.upper()
+            if transaction_mode not in TRANSACTION_MODES:
+                raise ImproperlyConfigured(
+                    "settings.DATABASES is improperly configured. transaction_mode "
+                    f"must be one of {', '.join(sorted(TRANSACTION_MODES))}, or None."
+                )
+        self.transaction_mode = transaction_mode
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for command in self.init_command.split(";"):
+            if command := command.strip():
+                conn.execute(command)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f"BEGIN {self.transaction_mode}")
@@ -0,0 +1,104 @@
+"""
+Serving of the static files collected in STATIC_ROOT.
+
+Files whose names are hashed by bookmarks.storage get far-future immutable cache
+headers, so browsers and CDNs never ask for them again; a new version of a file has a
+new name. Other files must be revalidated, which costs a 304 Not Modified response when
+they didn't change. Precompressed variants are served to the clients that accept them.
+"""
+
+import functools
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+from .storage import ENCODINGS
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def accepted_encodings(request):
+    """accepted_encodings returns the content codings accepted by the client, from its
+    Accept-Encoding header, leaving out those with q=0.
+
+    Returns:
+        set: names of the codings, such as "br" and "gzip"
+    """
+    accepted = set()
+    for coding in request.headers.get("Accept-Encoding", "").split(","):
+        name, _, params = coding.partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+@functools.cache
+def get_hashed_names():
+    """get_hashed_names returns the hashed names of the staticfiles manifest, which is
+    read once per process, like the storage does.
+
+    Returns:
+        frozenset: hashed names, empty if the storage doesn't hash names
+    """
+    return frozenset(getattr(staticfiles_storage, "hashed_files", {}).values())
+
+
+@require_safe
+def serve_static(request, path):
+    """serve_static serves a file of STATIC_ROOT, or its best precompressed variant.
+
+    Args:
+        request (GET): the request for the file
+        path (string): name of the file, relative to STATIC_ROOT
+
+    Returns:
+        FileResponse: the file, or 304 Not Modified
+    """
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except ValueError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    content_type, _ = mimetypes.guess_type(path)
+    accepted = accepted_encodings(request)
+    varies = False
+    file_path, encoding = full_path, None
+    for suffix, name in ENCODINGS.items():
+        if os.path.isfile(full_path + suffix):
+            varies = True
+            if encoding is None and name in accepted:
+                file_path, encoding = full_path + suffix, name
+    stat = os.stat(file_path)
+    hashed = path in get_hashed_names()
+    if not hashed and not was_modified_since(
+        request.headers.get("If-Modified-Since"), stat.st_mtime
+    ):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(
+            open(file_path, "rb"),
+            content_type=content_type or "application/octet-stream",
+            filename=os.path.basename(path),
+        )
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.headers["Last-Modified"] = http_date(stat.st_mtime)
+    if varies:
+        patch_vary_headers(response, ["Accept-Encoding"])
+    if hashed:
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+        )
+    else:
+        patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
@@ -0,0 +1,47 @@
+"""
+Static files storage for deployments.
+
+collectstatic copies the static files to STATIC_ROOT under names that contain the hash
+of their content, such as css/base.3b1e0f9a2c4d.css, and writes a gzip and a brotli
+variant next to every text file, such as css/base.3b1e0f9a2c4d.css.gz and .br. A hashed
+name never changes content, so bookmarks.staticfiles.serve_static serves those files
+with far-future immutable cache headers, and the precompressed variant the client
+accepts.
+"""
+
+import gzip
+
+import brotli
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+COMPRESSED_EXTENSIONS = (".css", ".js", ".svg", ".txt", ".html", ".json", ".map")
+# variant suffixes, with the Content-Encoding they are served with
+ENCODINGS = {".br": "br", ".gz": "gzip"}
+
+
+def compress(content, suffix):
+    """compress returns content compressed for the variant with the given suffix."""
+    if suffix == ".br":
+        return brotli.compress(content, mode=brotli.MODE_TEXT)
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if not name.endswith(COMPRESSED_EXTENSIONS):
+                continue
+            with self.open(name) as file:
+                content = file.read()
+            for suffix in ENCODINGS:
+                compressed = compress(content, suffix)
+                # not worth a variant, e.g. tiny files
+                if len(compressed) >= len(content) * 0.95:
+                    continue
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
@@ -3,18 +3,22 @@ URL configuration for bookmarks project.
 """
 
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from .media import serve_media
+from .staticfiles import serve_static
+
 urlpatterns = [
     path("admin/doc/", include("django.contrib.admindocs.urls")),
     path("admin/", admin.site.urls),
     path("account/", include("account.urls")),
     path("social-auth/", include("social_django.urls", namespace="social")),
     path("images/", include("images.urls", namespace="images")),
-    path("__debug__/", include("debug_toolbar.urls")),
+    # files of STATIC_ROOT, when no web server in front serves them
+    path(f"{settings.STATIC_URL.lstrip('/')}<path:path>", serve_static),
+    # uploaded files, handed off to the web server in front when there is one
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", serve_media),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+if settings.DEBUG_TOOLBAR:
+    urlpatterns.append(path("__debug__/", include("debug_toolbar.urls")))
@@ -0,0 +1,138 @@
+"""
+ZIP export of the images bookmarked by a user.
+
+The archive is built while it is being sent: every entry is written to a buffer that is
+emptied after each block, so only one block of an image is in memory at a time, whatever
+the size of the export. JPEG, PNG, GIF and WebP files are already compressed, so they
+are stored as is; compressing them again would cost CPU for nothing. The images are read
+from the database in chunks with .iterator(), and the manifest.jsonl entry, one JSON
+object per image, is spooled to a temporary file until the end of the archive.
+"""
+
+import json
+import os
+import tempfile
+import zipfile
+
+# bytes of an image read at a time
+BLOCK_SIZE = 256 * 1024
+# images read from the database at a time
+CHUNK_SIZE = 500
+STORED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+# manifests bigger than this go to disk
+MANIFEST_MEMORY_SIZE = 1024 * 1024
+
+
+class StreamBuffer:
+    """StreamBuffer is the unseekable file a ZipFile writes to. What was written since
+    the last drain() is kept until it is read by drain().
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def archive_name(image):
+    """archive_name returns the name of the file of an image in the archive."""
+    extension = os.path.splitext(image.image.name)[1].lower()
+    return f"images/{image.id}-{image.slug or 'image'}{extension}"
+
+
+def manifest_row(image, name):
+    """manifest_row returns the manifest.jsonl line of an image.
+
+    Args:
+        image (:model:`images.Image`): the image
+        name (string): name of its file in the archive, or None if it is missing
+
+    Returns:
+        string: a JSON object and a newline
+    """
+    row = {
+        "id": image.id,
+        "title": image.title,
+        "slug": image.slug,
+        "url": image.url,
+        "description": image.description,
+        "created": image.created.isoformat(),
+        "total_likes": image.total_likes,
+        "file": name,
+    }
+    return json.dumps(row) + "\n"
+
+
+def stream_export(user):
+    """stream_export yields a ZIP archive of the images bookmarked by a user, block by
+    block: the file of every image, under images/, and a manifest.jsonl entry.
+
+    Args:
+        user (object): User instance
+
+    Yields:
+        bytes: the next bytes of the archive
+    """
+    buffer = StreamBuffer()
+    for _ in write_archive(user, buffer):
+        if data := buffer.drain():
+            yield data
+    # the central directory, written as the archive was closed
+    if data := buffer.drain():
+        yield data
+
+
+def write_archive(user, buffer):
+    """write_archive writes the export of a user to buffer, and yields whenever it can
+    be drained.
+    """
+    images = user.images_created.order_by("id").only(
+        "id", "title", "slug", "url", "image", "description", "created", "total_likes"
+    )
+    with tempfile.SpooledTemporaryFile(
+        MANIFEST_MEMORY_SIZE, mode="w+", encoding="utf-8"
+    ) as manifest, zipfile.ZipFile(buffer, "w") as archive:
+        for image in images.iterator(chunk_size=CHUNK_SIZE):
+            name = archive_name(image)
+            try:
+                file = image.image.open("rb")
+            except (FileNotFoundError, ValueError):
+                # the file was deleted, or never saved
+                manifest.write(manifest_row(image, None))
+                continue
+            with file:
+                info = zipfile.ZipInfo(name, image.created.timetuple()[:6])
+                info.compress_type = (
+                    zipfile.ZIP_STORED
+                    if os.path.splitext(name)[1] in STORED_EXTENSIONS
+                    else zipfile.ZIP_DEFLATED
+                )
+                info.file_size = image.image.size
+                with archive.open(info, "w") as entry:
+                    while block := file.read(BLOCK_SIZE):
+                        entry.write(block)
+                        yield
+            manifest.write(manifest_row(image, name))
+        manifest.seek(0)
+        info = zipfile.ZipInfo("manifest.jsonl")
+        info.compress_type = zipfile.ZIP_DEFLATED
+        # its size is unknown until it is written
+        with archive.open(info, "w", force_zip64=True) as entry:
+            while block := manifest.read(BLOCK_SIZE):
+                entry.write(block.encode())
+                yield
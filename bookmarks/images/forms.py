@@ -4,6 +4,7 @@ from django.core.files.base import ContentFile
 from django.utils.text import slugify
 
 from .models import Image
+from .uploads import ERRORS, EXTENSIONS
 
 
 class ImageCreateForm(forms.ModelForm):
@@ -68,3 +69,53 @@ class ImageCreateForm(forms.ModelForm):
         if commit:
             image.save()
         return image
+
+
+class ImageUploadForm(forms.ModelForm):
+    """ImageUploadForm defines a ModelForm form from the :model:'images.Image' for images
+    uploaded from the disk of the user, with the title, description, and image fields.
+    The file is streamed to disk and validated by images.uploads.ImageUploadHandler,
+    which may refuse it before it is fully received.
+
+    Args:
+        forms (ModelForm): includes title, description, and image fields from :model:'images.Image'
+        upload_error (string, optional): why ImageUploadHandler refused the file
+    """
+
+    class Meta:
+        model = Image
+        # the file goes last, so the other fields are received even if it is refused
+        fields = ["title", "description", "image"]
+
+    def __init__(self, *args, upload_error=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_error = upload_error
+        if upload_error:
+            # the file was dropped, clean_image tells why
+            self.fields["image"].required = False
+
+    def clean_image(self):
+        if self.upload_error:
+            raise forms.ValidationError(ERRORS[self.upload_error])
+        return self.cleaned_data["image"]
+
+    def save(self, force_insert=False, force_update=False, commit=True):
+        """save names the uploaded file after the title of the image, as for the images
+        fetched from a URL. The temporary file of the upload is moved into storage.
+
+        Args:
+            force_insert (bool, optional): forces an INSERT. Defaults to False.
+            force_update (bool, optional): forces an UPDATE. Defaults to False.
+            commit (bool, optional): saves the form to the db if True. Defaults to True.
+
+        Returns:
+            :model:'images.Image' the updated Image model is saved
+        """
+        image = super().save(commit=False)
+        upload = self.cleaned_data["image"]
+        # the Pillow image that ImageField read from the header
+        extension = EXTENSIONS[upload.image.format]
+        image.image.save(f"{slugify(image.title)}.{extension}", upload, save=False)
+        if commit:
+            image.save()
+        return image
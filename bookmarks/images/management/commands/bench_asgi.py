@@ -0,0 +1,199 @@
+# images/management/commands/bench_asgi.py
+
+import asyncio
+import random
+import time
+from urllib.parse import urlencode
+
+import numpy as np
+from bookmarks.benchmark import create_images, fake_redis, summarize, test_database
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils.crypto import get_random_string
+
+
+async def call(application, method, path, cookies, body=b""):
+    """call sends a request straight to an ASGI application, without a server.
+
+    Returns:
+        int: status code of the response
+    """
+    headers = [
+        (b"host", b"testserver"),
+        (b"cookie", "; ".join(f"{k}={v}" for k, v in cookies.items()).encode()),
+    ]
+    if method == "POST":
+        headers += [
+            (b"content-type", b"application/x-www-form-urlencoded"),
+            (b"content-length", str(len(body)).encode()),
+            (b"x-csrftoken", cookies[settings.CSRF_COOKIE_NAME].encode()),
+        ]
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+    sent = False
+    status = None
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # the client stays connected until the response is sent
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await application(scope, receive, send)
+    return status
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the sync and async versions of image_detail, image_like and "
+        "user_follow under ASGI, with many concurrent connections"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=2000,
+            help="Requests per benchmark (default: 2000)",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1000,
+            help="Requests in flight at once (default: 1000)",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=50,
+            help="Logged-in users sending the requests (default: 50)",
+        )
+        parser.add_argument(
+            "--redis-latency",
+            type=float,
+            default=1.0,
+            help="Milliseconds per round trip to the fake Redis server (default: 1.0)",
+        )
+        parser.add_argument(
+            "--real-redis",
+            action="store_true",
+            help="Use the configured Redis server instead of a fake one",
+        )
+
+    def handle(self, *args, **options):
+        # requests are served by several threads
+        with test_database(on_disk=True):
+            if options["real_redis"]:
+                self.benchmark(options)
+            else:
+                with fake_redis(options["redis_latency"] / 1000):
+                    self.benchmark(options)
+        self.stdout.write(self.style.SUCCESS("Successfully benchmarked ASGI views"))
+
+    def benchmark(self, options):
+        User = get_user_model()
+        owner = User.objects.create_user("owner", password="password")
+        images = create_images(owner, 20, size=(60, 40))
+        sessions = []
+        for i in range(options["users"]):
+            client = Client()
+            client.force_login(User.objects.create_user(f"user{i}"))
+            sessions.append(
+                {
+                    settings.SESSION_COOKIE_NAME: client.cookies[
+                        settings.SESSION_COOKIE_NAME
+                    ].value,
+                    settings.CSRF_COOKIE_NAME: get_random_string(32),
+                }
+            )
+
+        def image_detail():
+            image = random.choice(images)
+            return "GET", image.get_absolute_url(), b""
+
+        def image_like():
+            action = random.choice(["like", "unlike"])
+            body = urlencode({"id": random.choice(images).id, "action": action})
+            return "POST", "/images/like/", body.encode()
+
+        def user_follow():
+            action = random.choice(["follow", "unfollow"])
+            body = urlencode({"id": owner.id, "action": action})
+            return "POST", "/account/users/follow/", body.encode()
+
+        benchmarks = [
+            ("image_detail", image_detail),
+            ("image_like", image_like),
+            ("user_follow", user_follow),
+        ]
+        self.stdout.write(
+            f"{'benchmark':<30}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}"
+        )
+        # a single event loop, like a server's, for every benchmark
+        asyncio.run(self.run_all(benchmarks, sessions, options))
+
+    async def run_all(self, benchmarks, sessions, options):
+        # without the sync-only debug toolbar, like bookmarks.asgi
+        middleware = [
+            name for name in settings.MIDDLEWARE if not name.startswith("debug_toolbar")
+        ]
+        with override_settings(MIDDLEWARE=middleware):
+            application = get_asgi_application()
+        for name, make_request in benchmarks:
+            for label, urlconf in [
+                ("sync", "bookmarks.urls"),
+                ("async", "bookmarks.asgi_urls"),
+            ]:
+                with override_settings(ROOT_URLCONF=urlconf):
+                    rate, stats, errors = await self.run(
+                        application, make_request, sessions, options
+                    )
+                self.stdout.write(
+                    f"{name + ', ' + label:<30}{rate:>10.1f}{stats['p50_ms']:>10.1f}"
+                    f"{stats['p95_ms']:>10.1f}{errors:>8}"
+                )
+
+    async def run(self, application, make_request, sessions, options):
+        semaphore = asyncio.Semaphore(options["concurrency"])
+        timings = np.empty(options["requests"])
+        errors = 0
+
+        async def one(i):
+            nonlocal errors
+            method, path, body = make_request()
+            async with semaphore:
+                started = time.perf_counter()
+                status = await call(
+                    application, method, path, random.choice(sessions), body
+                )
+                timings[i] = time.perf_counter() - started
+            if status != 200:
+                errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(options["requests"])))
+        elapsed = time.perf_counter() - started
+        return options["requests"] / elapsed, summarize(timings * 1000), errors
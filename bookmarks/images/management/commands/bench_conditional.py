@@ -0,0 +1,74 @@
+# images/management/commands/bench_conditional.py
+
+from bookmarks.benchmark import (
+    create_images,
+    format_header,
+    format_row,
+    measure,
+    test_database,
+)
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark repeated views of the image and profile pages, with and without "
+        "the validators of the previous response"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--images",
+            type=int,
+            default=40,
+            help="Images created in the test database (default: 40)",
+        )
+        parser.add_argument(
+            "--calls",
+            type=int,
+            default=200,
+            help="Requests per benchmark (default: 200)",
+        )
+
+    def handle(self, *args, **options):
+        with test_database():
+            User = get_user_model()
+            owner = User.objects.create_user("owner", password="password")
+            viewer = User.objects.create_user("viewer", password="password")
+            images = create_images(owner, options["images"])
+            for image in images[::2]:
+                image.users_like.add(viewer)
+            client = Client()
+            client.force_login(viewer)
+            anonymous = Client()
+            pages = [
+                ("image_detail", client, images[0].get_absolute_url()),
+                ("image_detail, anonymous", anonymous, images[0].get_absolute_url()),
+                ("image_list", client, "/images/"),
+                ("user_detail", client, f"/account/users/{owner.username}/"),
+            ]
+            self.stdout.write(f"{format_header()}{'bytes':>10}")
+            for name, page_client, url in pages:
+                self.run(name, page_client, url, options["calls"])
+        self.stdout.write(
+            self.style.SUCCESS("Successfully benchmarked conditional GET")
+        )
+
+    def run(self, name, client, url, calls):
+        # warm the fragment cache, and get the validators of the current page
+        response = client.get(url)
+        validators = {"HTTP_IF_NONE_MATCH": response["ETag"]}
+        sizes = {}
+
+        def get(headers):
+            response = client.get(url, **headers)
+            sizes[response.status_code] = len(response.content)
+
+        for label, headers in [("", {}), (", revalidated", validators)]:
+            stats = measure(get, [(headers,)] * calls)
+            status = 304 if headers else 200
+            self.stdout.write(
+                f"{format_row(name + label, stats)}{sizes.get(status, 0):>10}"
+            )
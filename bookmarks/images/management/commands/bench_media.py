@@ -0,0 +1,108 @@
+# images/management/commands/bench_media.py
+
+import os
+import time
+
+import numpy as np
+from bookmarks.benchmark import summarize, test_database
+from bookmarks.media import serve_media
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.views.static import serve
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the throughput of serving a large image original from Python, and "
+        "the cost of handing it off to the front server"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size",
+            type=int,
+            default=64,
+            help="Size of the original, in MiB (default: 64)",
+        )
+        parser.add_argument(
+            "--calls",
+            type=int,
+            default=20,
+            help="Downloads per benchmark (default: 20)",
+        )
+        parser.add_argument(
+            "--chunk",
+            type=int,
+            default=1024,
+            help="Size of the byte ranges of the ranged downloads, in KiB "
+            "(default: 1024)",
+        )
+
+    def handle(self, *args, **options):
+        # for its temporary MEDIA_ROOT
+        with test_database():
+            path = "images/bench/original.jpg"
+            full_path = os.path.join(settings.MEDIA_ROOT, path)
+            os.makedirs(os.path.dirname(full_path))
+            size = options["size"] * 1024 * 1024
+            with open(full_path, "wb") as file:
+                for _ in range(options["size"]):
+                    file.write(os.urandom(1024 * 1024))
+            factory = RequestFactory()
+            chunk = options["chunk"] * 1024
+
+            def static_serve():
+                request = factory.get(f"/media/{path}")
+                return [serve(request, path, document_root=settings.MEDIA_ROOT)]
+
+            def streamed():
+                return [serve_media(factory.get(f"/media/{path}"), path)]
+
+            def ranged():
+                return [
+                    serve_media(
+                        factory.get(
+                            f"/media/{path}",
+                            HTTP_RANGE=f"bytes={first}-{first + chunk - 1}",
+                        ),
+                        path,
+                    )
+                    for first in range(0, size, chunk)
+                ]
+
+            benchmarks = [
+                ("django.views.static.serve", static_serve, ""),
+                ("serve_media, streamed", streamed, ""),
+                (f"serve_media, {options['chunk']} KiB ranges", ranged, ""),
+                ("serve_media, X-Accel-Redirect", streamed, "nginx"),
+            ]
+            self.stdout.write(
+                f"{'benchmark':<36}{'MiB/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+                f"{'Python MiB':>12}"
+            )
+            for name, download, sendfile in benchmarks:
+                with override_settings(MEDIA_SENDFILE=sendfile):
+                    self.run(name, download, size, options["calls"])
+        self.stdout.write(self.style.SUCCESS("Successfully benchmarked media"))
+
+    def run(self, name, download, size, calls):
+        timings = np.empty(calls)
+        sent = 0
+        for i in range(calls):
+            started = time.perf_counter()
+            for response in download():
+                if response.streaming:
+                    for block in response.streaming_content:
+                        sent += len(block)
+                    response.close()
+                else:
+                    sent += len(response.content)
+            timings[i] = time.perf_counter() - started
+        stats = summarize(timings * 1000)
+        self.stdout.write(
+            f"{name:<36}{size * calls / timings.sum() / 2**20:>10.0f}"
+            f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+            f"{sent / calls / 2**20:>12.1f}"
+        )
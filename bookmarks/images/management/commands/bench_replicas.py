@@ -0,0 +1,141 @@
+# images/management/commands/bench_replicas.py
+
+import os
+import random
+import tempfile
+import time
+from contextlib import ExitStack
+
+from bookmarks.benchmark import QueryCounter, create_images, fake_redis, test_database
+from bookmarks.routers import sync_replicas
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from account.models import Contact
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the share of queries served by SQLite replicas, and the reads of "
+        "their own writes that users miss, with and without pinning to the primary"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--replicas",
+            type=int,
+            default=2,
+            help="SQLite replicas of the test database (default: 2)",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=1000,
+            help="Requests per benchmark (default: 1000)",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=100,
+            help="Logged-in users sending the requests (default: 100)",
+        )
+        parser.add_argument(
+            "--writes",
+            type=float,
+            default=0.05,
+            help="Share of requests that like an image or follow a user "
+            "(default: 0.05)",
+        )
+        parser.add_argument(
+            "--lag",
+            type=int,
+            default=50,
+            help="Requests between copies of the primary to the replicas "
+            "(default: 50)",
+        )
+
+    def handle(self, *args, **options):
+        aliases = [f"replica{i}" for i in range(1, options["replicas"] + 1)]
+        # Redis is faked, only the database is measured
+        with tempfile.TemporaryDirectory() as directory, test_database(
+            on_disk=True
+        ), fake_redis():
+            for alias in aliases:
+                # a file of its own, instead of a test mirror of the primary
+                settings_dict = {
+                    **connections["default"].settings_dict,
+                    "NAME": os.path.join(directory, f"{alias}.sqlite3"),
+                }
+                if alias in connections.settings:
+                    connections[alias].close()
+                connections.settings[alias] = settings_dict
+                connections[alias].settings_dict = settings_dict
+            try:
+                with override_settings(DATABASE_REPLICAS=aliases):
+                    self.benchmark(aliases, options)
+            finally:
+                for alias in aliases:
+                    connections[alias].close()
+        self.stdout.write(self.style.SUCCESS("Successfully benchmarked replicas"))
+
+    def benchmark(self, aliases, options):
+        User = get_user_model()
+        users = [User.objects.create_user(f"user{i}") for i in range(options["users"])]
+        images = create_images(users[0], 30, size=(60, 40))
+        for user in users:
+            for other in random.sample(users, 5):
+                if other != user:
+                    Contact.objects.get_or_create(user_from=user, user_to=other)
+        self.stdout.write(
+            f"{'benchmark':<20}{'primary':>10}{'replicas':>10}{'share':>8}"
+            f"{'stale':>8}{'ms/req':>8}"
+        )
+        for label, pin_seconds in [("pinned", 5), ("not pinned", 0)]:
+            with override_settings(REPLICA_PIN_SECONDS=pin_seconds):
+                self.run(label, users, images, aliases, options)
+
+    def run(self, label, users, images, aliases, options):
+        clients = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            clients.append((user, client))
+        reads = ["/images/", "/images/ranking/", "/account/users/", "/account/"]
+        counters = {alias: QueryCounter() for alias in ["default", *aliases]}
+        sync_replicas(aliases)
+        stale = 0
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias, counter in counters.items():
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            for i in range(options["requests"]):
+                if i and i % options["lag"] == 0:
+                    sync_replicas(aliases)
+                user, client = random.choice(clients)
+                if random.random() >= options["writes"]:
+                    client.get(random.choice(reads))
+                elif random.random() < 0.5:
+                    other = random.choice(users)
+                    action = random.choice(["follow", "unfollow"])
+                    client.post(
+                        "/account/users/follow/", {"id": other.id, "action": action}
+                    )
+                else:
+                    # the user likes an image, then looks at it
+                    image = random.choice(images)
+                    action = random.choice(["like", "unlike"])
+                    client.post("/images/like/", {"id": image.id, "action": action})
+                    response = client.get(image.get_absolute_url())
+                    if response.context["is_liked"] != (action == "like"):
+                        stale += 1
+        elapsed = time.perf_counter() - started
+        primary = counters["default"].count
+        replicas = sum(counters[alias].count for alias in aliases)
+        self.stdout.write(
+            f"{label:<20}{primary:>10}{replicas:>10}"
+            f"{replicas / max(primary + replicas, 1):>8.1%}{stale:>8}"
+            f"{elapsed * 1000 / options['requests']:>8.2f}"
+        )
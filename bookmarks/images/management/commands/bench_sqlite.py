@@ -0,0 +1,147 @@
+# images/management/commands/bench_sqlite.py
+
+import random
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from bookmarks.benchmark import create_images, fake_redis, summarize, test_database
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connections
+from django.test import Client
+
+# stock is django.db.backends.sqlite3 as configured by startproject, and WAL only the
+#   tuned configuration without its pragmas and immediate transactions
+CONFIGURATIONS = [
+    (
+        "stock",
+        "DELETE",
+        {"ENGINE": "django.db.backends.sqlite3", "OPTIONS": {}, "CONN_MAX_AGE": 0},
+    ),
+    (
+        "WAL only",
+        "WAL",
+        {
+            "ENGINE": "bookmarks.sqlite_backend",
+            "OPTIONS": {"init_command": "", "transaction_mode": None},
+        },
+    ),
+    ("tuned", "WAL", {"ENGINE": "bookmarks.sqlite_backend"}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark concurrent likes and follows from several threads on the stock "
+        "and tuned SQLite configurations, with their rate of 'database is locked' "
+        "errors"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=8,
+            help="Threads sending requests at once (default: 8)",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Requests per thread (default: 200)",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.SQLITE_TUNED:
+            raise CommandError("The tuned configuration is off, DJANGO_SQLITE_TUNED")
+        # Redis is faked, only the database is measured
+        with test_database(on_disk=True), fake_redis():
+            User = get_user_model()
+            users = [
+                User.objects.create_user(f"user{i}")
+                for i in range(options["threads"] * 4)
+            ]
+            images = create_images(users[0], 50, size=(60, 40))
+            self.stdout.write(
+                f"{'configuration':<20}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+                f"{'locked':>10}"
+            )
+            database = connections.settings["default"]
+            tuned = {
+                key: database[key] for key in ["ENGINE", "OPTIONS", "CONN_MAX_AGE"]
+            }
+            try:
+                for name, journal_mode, configuration in CONFIGURATIONS:
+                    connections["default"].close()
+                    # the journal mode is kept in the database file
+                    with sqlite3.connect(database["NAME"]) as conn:
+                        conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+                    # the connections of the threads are made with these settings
+                    database.update({**tuned, **configuration})
+                    self.run(name, users, images, options)
+            finally:
+                database.update(tuned)
+        self.stdout.write(self.style.SUCCESS("Successfully benchmarked SQLite"))
+
+    def run(self, name, users, images, options):
+        clients = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+        timings = []
+        locked = []
+
+        def work(clients):
+            thread_timings = []
+            thread_locked = 0
+            for _ in range(options["requests"]):
+                client = random.choice(clients)
+                if random.random() < 0.5:
+                    path = "/images/like/"
+                    data = {
+                        "id": random.choice(images).id,
+                        "action": random.choice(["like", "unlike"]),
+                    }
+                else:
+                    path = "/account/users/follow/"
+                    data = {
+                        "id": random.choice(users).id,
+                        "action": random.choice(["follow", "unfollow"]),
+                    }
+                started = time.perf_counter()
+                try:
+                    client.post(path, data)
+                except OperationalError as e:
+                    if "locked" not in str(e):
+                        raise
+                    thread_locked += 1
+                finally:
+                    # like the end of a request, which honors CONN_MAX_AGE
+                    close_old_connections()
+                thread_timings.append(time.perf_counter() - started)
+            connections.close_all()
+            timings.extend(thread_timings)
+            locked.append(thread_locked)
+
+        # every thread has clients of its own
+        threads = [
+            threading.Thread(target=work, args=(clients[i :: options["threads"]],))
+            for i in range(options["threads"])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stats = summarize(np.array(timings) * 1000)
+        total = len(timings)
+        errors = sum(locked)
+        self.stdout.write(
+            f"{name:<20}{(total - errors) / elapsed:>10.1f}{stats['p50_ms']:>10.2f}"
+            f"{stats['p95_ms']:>10.2f}{errors / max(total, 1):>10.1%}"
+        )
@@ -0,0 +1,308 @@
+# images/management/commands/bench_views.py
+
+import json
+from pathlib import Path
+
+import numpy as np
+from account.deletion import count_likes
+from account.models import Contact, ensure_profiles
+from actions.models import Action
+from bookmarks.benchmark import (
+    create_images,
+    fake_redis,
+    format_header,
+    format_row,
+    measure,
+    measure_memory,
+    test_database,
+)
+from bookmarks.redis_pool import r
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from images.models import Image
+
+# images per page of image_list
+IMAGES_PER_PAGE = 8
+# rows created at a time
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the latency, queries and memory allocations of the core views with "
+        "the test client, on generated data of a given scale, and compare them to a "
+        "baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=100,
+            help="Users created in the test database (default: 100)",
+        )
+        parser.add_argument(
+            "--images",
+            type=int,
+            default=1000,
+            help="Images created in the test database, sharing one file "
+            "(default: 1000)",
+        )
+        parser.add_argument(
+            "--follows",
+            type=int,
+            default=20,
+            help="Users followed by every user (default: 20)",
+        )
+        parser.add_argument(
+            "--likes",
+            type=int,
+            default=5,
+            help="Likes of every image (default: 5)",
+        )
+        parser.add_argument(
+            "--calls",
+            type=int,
+            default=100,
+            help="Requests per benchmark (default: 100)",
+        )
+        parser.add_argument(
+            "--memory-calls",
+            type=int,
+            default=10,
+            help="Requests per benchmark traced by tracemalloc (default: 10)",
+        )
+        parser.add_argument(
+            "--redis-latency",
+            type=float,
+            default=0.1,
+            help="Milliseconds per round trip to the fake Redis server (default: 0.1)",
+        )
+        parser.add_argument(
+            "--output",
+            type=Path,
+            help="Write the results to this JSON file",
+        )
+        parser.add_argument(
+            "--baseline",
+            type=Path,
+            help="Compare the results to those of this JSON file, and fail if any "
+            "benchmark regressed",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=20,
+            help="Percentage by which p95 latency and memory may grow over the "
+            "baseline (default: 20)",
+        )
+
+    def handle(self, *args, **options):
+        scale = {
+            name: options[name] for name in ("users", "images", "follows", "likes")
+        }
+        if options["users"] < 2 or options["images"] < 1:
+            raise CommandError("At least 2 users and 1 image are needed")
+        baseline = None
+        if options["baseline"]:
+            baseline = json.loads(options["baseline"].read_text())
+        with test_database(), fake_redis(options["redis_latency"] / 1000):
+            benchmarks = self.populate(scale)
+            self.stdout.write(f"{format_header()}{'alloc KiB':>10}")
+            results = {}
+            for name, client, requests in benchmarks:
+                results[name] = self.run(name, client, requests, options)
+        report = {"scale": scale, "calls": options["calls"], "results": results}
+        if options["output"]:
+            options["output"].write_text(json.dumps(report, indent=2) + "\n")
+            self.stdout.write(f"Results written to {options['output']}")
+        if baseline is not None:
+            regressions = self.compare(report, baseline, options["tolerance"])
+            if regressions:
+                raise CommandError(
+                    f"{len(regressions)} regressions: {', '.join(regressions)}"
+                )
+        self.stdout.write(self.style.SUCCESS("Successfully benchmarked views"))
+
+    def populate(self, scale):
+        """populate fills the test database, and lists the requests of every
+        benchmark.
+
+        Args:
+            scale (dict): users, images, follows per user and likes per image
+
+        Returns:
+            list: name, logged-in client and requests of every benchmark
+        """
+        rng = np.random.default_rng(0)
+        User = get_user_model()
+        users = User.objects.bulk_create(
+            [User(username=f"user{i}") for i in range(scale["users"])],
+            batch_size=BATCH_SIZE,
+        )
+        user_ids = [user.id for user in users]
+        ensure_profiles(user_ids)
+
+        # a single file, so its thumbnails are generated once
+        [first] = create_images(users[0], 1, (800, 600))
+        images = [first] + Image.objects.bulk_create(
+            [
+                Image(
+                    user=users[i % len(users)],
+                    title=f"Image {i}",
+                    slug=f"image-{i}",
+                    url=f"https://example.com/{i}.jpg",
+                    image=first.image.name,
+                )
+                for i in range(1, scale["images"])
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        image_ids = [image.id for image in images]
+
+        likes = min(scale["likes"], len(users))
+        Like = Image.users_like.through
+        Like.objects.bulk_create(
+            [
+                Like(image_id=image_id, user_id=user_ids[row])
+                for image_id in image_ids
+                for row in rng.choice(len(users), likes, replace=False)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        for start in range(0, len(image_ids), BATCH_SIZE):
+            count_likes(image_ids[start : start + BATCH_SIZE])
+
+        follows = min(scale["follows"], len(users) - 1)
+        Contact.objects.bulk_create(
+            [
+                Contact(user_from_id=user_id, user_to_id=user_ids[row])
+                for i, user_id in enumerate(user_ids)
+                for row in (i + 1 + rng.choice(len(users) - 1, follows, replace=False))
+                % len(users)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        image_ct = ContentType.objects.get_for_model(Image)
+        Action.objects.bulk_create(
+            [
+                Action(
+                    user_id=image.user_id,
+                    verb="bookmarked image",
+                    target_ct=image_ct,
+                    target_id=image.id,
+                )
+                for image in images
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        r.zadd(
+            "image_ranking",
+            dict(zip(image_ids, rng.integers(1, 1000, len(image_ids)).tolist())),
+        )
+
+        # a user who follows others and likes images, like an active user
+        viewer = Client()
+        viewer.force_login(users[1])
+        deep_page = (len(images) - 1) // IMAGES_PER_PAGE + 1
+        detail_urls = [image.get_absolute_url() for image in images[:50]]
+        return [
+            ("dashboard", viewer, [("get", "/account/", {})]),
+            ("image_list, first page", viewer, [("get", "/images/", {})]),
+            (
+                "image_list, deep page",
+                viewer,
+                [("get", "/images/", {"page": deep_page})],
+            ),
+            (
+                "image_detail",
+                viewer,
+                [("get", url, {}) for url in detail_urls],
+            ),
+            ("image_ranking", viewer, [("get", "/images/ranking/", {})]),
+            ("user_list", viewer, [("get", "/account/users/", {})]),
+            (
+                "user_detail",
+                viewer,
+                [("get", f"/account/users/{users[0].username}/", {})],
+            ),
+            (
+                "image_like",
+                viewer,
+                [
+                    ("post", "/images/like/", {"id": images[0].id, "action": action})
+                    for action in ("like", "unlike")
+                ],
+            ),
+            (
+                "user_follow",
+                viewer,
+                [
+                    (
+                        "post",
+                        "/account/users/follow/",
+                        {"id": users[0].id, "action": action},
+                    )
+                    for action in ("follow", "unfollow")
+                ],
+            ),
+        ]
+
+    def run(self, name, client, requests, options):
+        def request(method, url, data):
+            response = getattr(client, method)(url, data)
+            if response.status_code != 200 or (
+                method == "post" and response.json()["status"] != "ok"
+            ):
+                raise CommandError(f"{name}: {method.upper()} {url} failed")
+
+        # warm the caches, and check every request works
+        for args in requests:
+            request(*args)
+        calls = [requests[i % len(requests)] for i in range(options["calls"])]
+        stats = measure(request, calls)
+        stats["alloc_kib"] = measure_memory(request, calls[: options["memory_calls"]])
+        self.stdout.write(f"{format_row(name, stats)}{stats['alloc_kib']:>10.1f}")
+        return stats
+
+    def compare(self, report, baseline, tolerance):
+        """compare reports how the results changed since the baseline.
+
+        Args:
+            report (dict): the current results
+            baseline (dict): the results of the baseline
+            tolerance (float): percentage by which latency and memory may grow
+
+        Returns:
+            list: the benchmarks that regressed, with what regressed
+        """
+        if baseline["scale"] != report["scale"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"The baseline was measured at another scale: {baseline['scale']}"
+                )
+            )
+        limit = 1 + tolerance / 100
+        regressions = []
+        for name, stats in report["results"].items():
+            old = baseline["results"].get(name)
+            if old is None:
+                continue
+            changes = []
+            if stats["p95_ms"] > old["p95_ms"] * limit:
+                changes.append("p95")
+            if stats["queries"] > old["queries"]:
+                changes.append("queries")
+            if stats["alloc_kib"] > old["alloc_kib"] * limit:
+                changes.append("memory")
+            self.stdout.write(
+                f"{name:<40}p95 {old['p95_ms']:.3f} -> {stats['p95_ms']:.3f} ms, "
+                f"queries {old['queries']:.2f} -> {stats['queries']:.2f}, "
+                f"alloc {old['alloc_kib']:.1f} -> {stats['alloc_kib']:.1f} KiB"
+            )
+            if changes:
+                regressions.append(f"{name} ({', '.join(changes)})")
+        return regressions
@@ -0,0 +1,50 @@
+# images/management/commands/compute_similar_images.py
+
+from django.core.management.base import BaseCommand
+from images.recommendations import (
+    MAX_LIKERS,
+    MAX_PAIRS,
+    TOP_N,
+    compute_similar_images,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the images most often liked by the same users as every image, and "
+        "store them in Redis for the 'more like this' strip of image_detail"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-n",
+            type=int,
+            default=TOP_N,
+            help=f"Similar images stored per image (default: {TOP_N})",
+        )
+        parser.add_argument(
+            "--max-likers",
+            type=int,
+            default=MAX_LIKERS,
+            help=f"Likers sampled for popular images (default: {MAX_LIKERS})",
+        )
+        parser.add_argument(
+            "--max-pairs",
+            type=int,
+            default=MAX_PAIRS,
+            help=f"Co-likes computed per batch (default: {MAX_PAIRS})",
+        )
+
+    def handle(self, *args, **options):
+        stats = compute_similar_images(
+            top_n=options["top_n"],
+            max_likers=options["max_likers"],
+            max_pairs=options["max_pairs"],
+        )
+        self.stdout.write(
+            f"{stats['likes']} likes of {stats['images']} images exported "
+            f"in {stats['export_seconds']:.2f}s\n"
+            f"Similar images computed in {stats['compute_seconds']:.2f}s, "
+            f"{stats['stale']} stale sets deleted"
+        )
+        self.stdout.write(self.style.SUCCESS("Successfully computed similar images"))
@@ -0,0 +1,40 @@
+# images/management/commands/export_images.py
+
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from images.export import stream_export
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the images bookmarked by a user to a ZIP archive, the same as the "
+        "download of their dashboard"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="User whose images are exported")
+        parser.add_argument(
+            "--output",
+            help="Path of the archive (default: <username>-bookmarks.zip)",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['username']}")
+        output = options["output"] or f"{user.username}-bookmarks.zip"
+        start = time.perf_counter()
+        size = 0
+        with open(output, "wb") as file:
+            for chunk in stream_export(user):
+                file.write(chunk)
+                size += len(chunk)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Wrote {size / 2**20:.1f} MiB to {output} in {elapsed:.2f} seconds"
+        )
+        self.stdout.write(self.style.SUCCESS("Successfully exported images"))
@@ -0,0 +1,34 @@
+# images/management/commands/fragment_stats.py
+
+from bookmarks.cache import get_fragment_stats, reset_fragment_stats
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Report the hit ratio of the cached page fragments, and the rendering time "
+        "saved by their hits"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Forget the recorded stats after reporting them",
+        )
+
+    def handle(self, *args, **options):
+        stats = get_fragment_stats()
+        self.stdout.write(
+            f"{'fragment':<20}{'hits':>10}{'misses':>10}{'hit ratio':>12}"
+            f"{'render s':>12}{'saved s':>12}"
+        )
+        for name, values in stats.items():
+            self.stdout.write(
+                f"{name:<20}{values['hits']:>10}{values['misses']:>10}"
+                f"{values['hit_ratio']:>12.1%}{values['render_seconds']:>12.3f}"
+                f"{values['saved_seconds']:>12.3f}"
+            )
+        if options["reset"]:
+            reset_fragment_stats()
+        self.stdout.write(self.style.SUCCESS("Successfully reported fragment stats"))
@@ -0,0 +1,56 @@
+# images/management/commands/gc_media.py
+
+from datetime import timedelta
+
+from bookmarks.media_gc import collect_garbage
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the uploaded images, profile photos and thumbnails that no image or "
+        "profile refers to anymore"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace",
+            type=float,
+            default=24,
+            help="Keep the files modified in the last hours (default: 24)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Files deleted at the same time (default: 8)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List the files that would be deleted, without deleting them",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        originals = thumbnails = reclaimed = 0
+        for name, size, thumbnail in collect_garbage(
+            grace=timedelta(hours=options["grace"]),
+            dry_run=dry_run,
+            workers=options["workers"],
+        ):
+            if dry_run or options["verbosity"] > 1:
+                self.stdout.write(name)
+            if thumbnail:
+                thumbnails += 1
+            else:
+                originals += 1
+            reclaimed += size
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(
+            f"{verb} {originals} original{'s' if originals != 1 else ''} and "
+            f"{thumbnails} thumbnail{'s' if thumbnails != 1 else ''}, "
+            f"{filesizeformat(reclaimed)}"
+        )
+        self.stdout.write(self.style.SUCCESS("Successfully collected media garbage"))
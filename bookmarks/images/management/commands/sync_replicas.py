@@ -0,0 +1,34 @@
+# images/management/commands/sync_replicas.py
+
+from bookmarks.routers import sync_replicas
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite database over its SQLite replicas, the local stand-ins for "
+        "replicated databases"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "aliases",
+            nargs="*",
+            help="Replicas to copy to (default: all of DATABASE_REPLICAS)",
+        )
+
+    def handle(self, *args, **options):
+        aliases = options["aliases"] or settings.DATABASE_REPLICAS
+        unknown = set(aliases) - set(settings.DATABASE_REPLICAS)
+        if unknown:
+            raise CommandError(f"Not replicas: {', '.join(sorted(unknown))}")
+        if not aliases:
+            raise CommandError("No replicas, set DJANGO_DATABASE_REPLICAS")
+        try:
+            synced = sync_replicas(aliases)
+        except ValueError as e:
+            raise CommandError(e)
+        for alias in synced:
+            self.stdout.write(f"Copied the primary database to {alias}")
+        self.stdout.write(self.style.SUCCESS("Successfully synced replicas"))
@@ -46,6 +46,8 @@ class Image(models.Model):
         indexes = [
             models.Index(fields=["-created"]),
             models.Index(fields=["-total_likes"]),
+            # profile pages list the images of a user newest first
+            models.Index(fields=["user", "-created"]),
         ]
         ordering = ["-created"]
 
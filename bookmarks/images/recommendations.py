@@ -0,0 +1,252 @@
+"""
+"More like this" recommendations from the likes of users.
+
+Two images are similar when the same users like them. The similarity of two images is
+the cosine of their columns in the user x image like matrix: the number of users who
+like both, divided by the square root of the product of their like counts. It is
+computed for every image at once by the compute_similar_images management command,
+with NumPy over CSR arrays of the likes, and the top images of every image are stored
+in a Redis sorted set. image_detail only reads that set. The sets of images that are
+not liked anymore are deleted by the same run.
+"""
+
+import time
+
+import numpy as np
+from bookmarks.redis_pool import ar, r
+from bookmarks.sparse import (
+    build_csr,
+    cost_batches,
+    count_pairs,
+    dense_ids,
+    gather_rows,
+    top_k_per_row,
+)
+
+from .models import Image
+
+SIMILAR_KEY = "image:{}:similar"
+# keys scanned per SCAN call when looking for stale sets
+SCAN_COUNT = 1000
+TOP_N = 12
+# likers read per image; more popular images use a random sample of their likers
+MAX_LIKERS = 1000
+# co-likes expanded per batch, which bounds the memory used by a batch
+MAX_PAIRS = 5_000_000
+
+
+class LikeMatrix:
+    """LikeMatrix holds the user x image like matrix as CSR arrays in both directions.
+
+    Args:
+        image_ids (ndarray): database id of the image of every image row
+        likers_indptr, likers (ndarray): users who like every image
+        likes_indptr, likes (ndarray): images liked by every user
+    """
+
+    def __init__(self, image_ids, likers_indptr, likers, likes_indptr, likes):
+        self.image_ids = image_ids
+        self.likers_indptr = likers_indptr
+        self.likers = likers
+        self.likes_indptr = likes_indptr
+        self.likes = likes
+
+    @classmethod
+    def from_database(cls, chunk_size=100_000):
+        """from_database exports every like, streaming the rows from the database in
+        chunks.
+
+        Args:
+            chunk_size (int, optional): rows fetched at a time. Defaults to 100_000.
+
+        Returns:
+            LikeMatrix: the matrix
+        """
+        likes = Image.users_like.through.objects.order_by().values_list(
+            "image_id", "user_id"
+        )
+        chunks = []
+        chunk = []
+        for like in likes.iterator(chunk_size=chunk_size):
+            chunk.append(like)
+            if len(chunk) == chunk_size:
+                chunks.append(np.array(chunk, dtype=np.int64))
+                chunk = []
+        chunks.append(np.array(chunk, dtype=np.int64).reshape(-1, 2))
+        likes = np.concatenate(chunks)
+        image_ids, image_rows = dense_ids(likes[:, 0])
+        user_ids, user_rows = dense_ids(likes[:, 1])
+        likers_indptr, likers = build_csr(image_rows, user_rows, len(image_ids))
+        likes_indptr, liked = build_csr(user_rows, image_rows, len(user_ids))
+        return cls(image_ids, likers_indptr, likers, likes_indptr, liked)
+
+    def __len__(self):
+        return len(self.image_ids)
+
+    @property
+    def edges(self):
+        return len(self.likers)
+
+    def similar(self, top_n=TOP_N, max_likers=MAX_LIKERS, max_pairs=MAX_PAIRS, seed=0):
+        """similar computes the most similar images of every image, in batches of about
+        max_pairs co-likes. Images with more than max_likers likers only read a random
+        sample of them, and their co-like counts are scaled up to match.
+
+        Args:
+            top_n (int, optional): similar images kept per image. Defaults to TOP_N.
+            max_likers (int, optional): likers sampled per image. Defaults to MAX_LIKERS.
+            max_pairs (int, optional): batch budget. Defaults to MAX_PAIRS.
+            seed (int, optional): seed of the sampling. Defaults to 0.
+
+        Yields:
+            tuple: for every batch, the batch rows, and the rows, similar rows and
+            similarities of its images, most similar first within a row
+        """
+        rng = np.random.default_rng(seed)
+        n_rows = len(self)
+        popularity = np.diff(self.likers_indptr)
+        sampled = np.minimum(popularity, max_likers)
+        activity = np.diff(self.likes_indptr)
+        # co-likes of an image: the sum of the like counts of its likers
+        like_rows = np.repeat(np.arange(n_rows), popularity)
+        costs = np.bincount(like_rows, weights=activity[self.likers], minlength=n_rows)
+        costs = costs * sampled / np.maximum(popularity, 1)
+        for batch in cost_batches(costs, max_pairs):
+            owners, users = gather_rows(self.likers_indptr, self.likers, batch)
+            if (popularity[batch] > max_likers).any():
+                # keep a random max_likers of the likers of every image
+                owners, users, _ = top_k_per_row(
+                    owners, users, rng.random(len(owners)), max_likers
+                )
+            likers_of, images = gather_rows(self.likes_indptr, self.likes, users)
+            sources, images, counts = count_pairs(
+                batch[owners[likers_of]], images, n_rows
+            )
+            keep = images != sources
+            sources, images, counts = sources[keep], images[keep], counts[keep]
+            counts = counts * (popularity[sources] / sampled[sources])
+            similarity = counts / np.sqrt(popularity[sources] * popularity[images])
+            yield batch, *top_k_per_row(sources, images, similarity, top_n)
+
+
+def store_similar(matrix, batch, sources, images, similarity):
+    """store_similar replaces the stored similar images of a batch of images.
+
+    Args:
+        matrix (LikeMatrix): the matrix the rows refer to
+        batch (ndarray): rows whose similar images are replaced
+        sources, images, similarity (ndarray): similar images of the batch, by row
+    """
+    image_ids = matrix.image_ids
+    pipeline = r.pipeline(transaction=False)
+    for image_id in image_ids[batch]:
+        pipeline.delete(SIMILAR_KEY.format(image_id))
+    bounds = np.flatnonzero(np.diff(sources)) + 1
+    for rows, cols, values in zip(
+        np.split(sources, bounds),
+        np.split(images, bounds),
+        np.split(similarity, bounds),
+    ):
+        if len(rows):
+            pipeline.zadd(
+                SIMILAR_KEY.format(image_ids[rows[0]]),
+                dict(zip(image_ids[cols].tolist(), values.tolist())),
+            )
+    pipeline.execute()
+
+
+def forget_stale_similar(matrix):
+    """forget_stale_similar deletes the stored similar images of the images that are not
+    in the matrix anymore, such as images that lost all their likes.
+
+    Args:
+        matrix (LikeMatrix): the matrix whose images were just stored
+
+    Returns:
+        int: the number of deleted sets
+    """
+    image_ids = set(matrix.image_ids.tolist())
+    prefix, suffix = SIMILAR_KEY.split("{}")
+    stale = []
+    for key in r.scan_iter(match=SIMILAR_KEY.format("*"), count=SCAN_COUNT):
+        image_id = key.decode()[len(prefix) : -len(suffix)]
+        if image_id.isdigit() and int(image_id) not in image_ids:
+            stale.append(key)
+    for start in range(0, len(stale), SCAN_COUNT):
+        r.delete(*stale[start : start + SCAN_COUNT])
+    return len(stale)
+
+
+def compute_similar_images(top_n=TOP_N, max_likers=MAX_LIKERS, max_pairs=MAX_PAIRS):
+    """compute_similar_images recomputes and stores the similar images of every liked
+    image, and deletes those of the images that are not liked anymore.
+
+    Args:
+        top_n (int, optional): similar images kept per image. Defaults to TOP_N.
+        max_likers (int, optional): likers sampled per image. Defaults to MAX_LIKERS.
+        max_pairs (int, optional): batch budget. Defaults to MAX_PAIRS.
+
+    Returns:
+        dict: images and likes in the matrix, the number of stale sets deleted, and
+        the seconds spent exporting the likes and computing and storing the similar
+        images
+    """
+    started = time.perf_counter()
+    matrix = LikeMatrix.from_database()
+    exported = time.perf_counter()
+    for batch, sources, images, similarity in matrix.similar(
+        top_n, max_likers, max_pairs
+    ):
+        store_similar(matrix, batch, sources, images, similarity)
+    stale = forget_stale_similar(matrix)
+    finished = time.perf_counter()
+    return {
+        "images": len(matrix),
+        "likes": matrix.edges,
+        "stale": stale,
+        "export_seconds": exported - started,
+        "compute_seconds": finished - exported,
+    }
+
+
+def get_similar_ids(image, count=6):
+    """get_similar_ids reads the ids of the stored similar images of an image.
+
+    Args:
+        image (:model:`images.Image`): the image being viewed
+        count (int, optional): number of images. Defaults to 6.
+
+    Returns:
+        list: image ids, most similar first
+    """
+    return [
+        int(image_id)
+        for image_id in r.zrevrange(SIMILAR_KEY.format(image.id), 0, count - 1)
+    ]
+
+
+async def aget_similar_ids(image, count=6):
+    """aget_similar_ids is the async version of get_similar_ids."""
+    return [
+        int(image_id)
+        for image_id in await ar.zrevrange(SIMILAR_KEY.format(image.id), 0, count - 1)
+    ]
+
+
+def get_similar_images(image, count=6, ids=None):
+    """get_similar_images reads the stored similar images of an image.
+
+    Args:
+        image (:model:`images.Image`): the image being viewed
+        count (int, optional): number of images. Defaults to 6.
+        ids (list, optional): ids already read with get_similar_ids. Defaults to None.
+
+    Returns:
+        list: Image objects with the columns needed for thumbnails, most similar first
+    """
+    if ids is None:
+        ids = get_similar_ids(image, count)
+    if not ids:
+        return []
+    images = Image.objects.only("id", "title", "slug", "image").in_bulk(ids)
+    return [images[image_id] for image_id in ids if image_id in images]
@@ -1,4 +1,7 @@
-from django.db.models.signals import m2m_changed
+from account.models import adjust_profile_count
+from account.user_cache import invalidate_user
+from bookmarks.cache import bump_version
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
 from .models import Image
@@ -15,4 +18,29 @@ def users_like_changed(sender, instance, **kwargs):
         instance (PositiveIntegerField): the number of people who like an image
     """
     instance.total_likes = instance.users_like.count()
+    # saving the image also bumps its version, see image_changed
     instance.save()
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+def image_changed(sender, instance, **kwargs):
+    """image_changed bumps the version of a saved or deleted image, so the cached
+    fragments that show it are rendered again.
+    """
+    bump_version("image", instance.id)
+
+
+@receiver(post_save, sender=Image)
+def image_created(sender, instance, created, **kwargs):
+    """image_created counts a new image on the profile of the user who bookmarked it."""
+    if created:
+        adjust_profile_count(instance.user_id, "images_count", 1)
+        invalidate_user(instance.user_id)
+
+
+@receiver(post_delete, sender=Image)
+def image_deleted(sender, instance, **kwargs):
+    """image_deleted uncounts a deleted image on the profile of its user."""
+    adjust_profile_count(instance.user_id, "images_count", -1)
+    invalidate_user(instance.user_id)
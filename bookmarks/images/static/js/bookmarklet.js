@@ -1,5 +1,6 @@
 const siteUrl = '//127.0.0.1:8000/';  // base URL for the website
-const styleUrl = siteUrl + 'static/css/bookmarklet.css';  // base URL for static files
+// hashed URL of the stylesheet, set by the launcher
+const styleUrl = window.bookmarkletStyleUrl || siteUrl + 'static/css/bookmarklet.css';
 const minWidth = 250;  // minimum width for images bookmarklet will collect for the site
 const minHeight = 250; // minimum height for images bookmarklet will collect for the site
 
@@ -8,7 +9,7 @@ var head = document.getElementsByTagName('head')[0];  // Get HTML head element
 var link = document.createElement('link'); // Create new link Element
 link.rel = 'stylesheet'; // set the attributes for link element
 link.type = 'text/css';
-link.href = styleUrl + '?r=' + Math.floor(Math.random()*9999999999999999);
+link.href = styleUrl;
 head.appendChild(link);  // Append link element to HTML head
 
 // load HTML
@@ -1,7 +1,8 @@
-(function(){
+{% load static %}{# hashed names, which browsers cache for good #}(function(){
     if(!window.bookmarklet) {
+        window.bookmarkletStyleUrl = '//127.0.0.1:8000{% static "css/bookmarklet.css" %}';
         bookmarklet_js = document.body.appendChild(document.createElement('script'));
-        bookmarklet_js.src = '//127.0.0.1:8000/static/js/bookmarklet.js?r='+Math.floor(Math.random()*9999999999999999);
+        bookmarklet_js.src = '//127.0.0.1:8000{% static "js/bookmarklet.js" %}';
         window.bookmarklet = true;
     }
     else {
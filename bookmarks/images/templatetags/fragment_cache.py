@@ -0,0 +1,53 @@
+import time
+
+from bookmarks.cache import get_fragment, record_fragment
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        vary_on = [variable.resolve(context) for variable in self.vary_on]
+        key = make_template_fragment_key(self.name, vary_on)
+        cached = get_fragment(key)
+        if cached is not None:
+            content, seconds = cached
+            record_fragment(self.name, True, seconds)
+            return content
+        started = time.perf_counter()
+        content = self.nodelist.render(context)
+        seconds = time.perf_counter() - started
+        cache.set(key, (content, seconds), settings.FRAGMENT_CACHE_TIMEOUT)
+        record_fragment(self.name, False, seconds)
+        return content
+
+
+@register.tag
+def fragment(parser, token):
+    """fragment caches the contents of the block for FRAGMENT_CACHE_TIMEOUT seconds,
+    like {% cache %}, and records its hits, misses and rendering time for the
+    fragment_stats management command. The block should vary on the versions of the
+    objects it shows, see bookmarks.cache.
+
+    Usage:
+        {% fragment name var1 var2 ... %} ... {% endfragment %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least a fragment name."
+        )
+    nodelist = parser.parse(("endfragment",))
+    parser.delete_first_token()
+    return FragmentNode(
+        nodelist, bits[1], [parser.compile_filter(bit) for bit in bits[2:]]
+    )
@@ -0,0 +1,96 @@
+"""
+Upload handler for images sent from the disk of the user.
+
+ImageUploadHandler streams the image field of a multipart request to a temporary file,
+so an upload never sits in memory, and checks it while it is being received:
+
+- a request whose Content-Length is bigger than the limits allow is stopped before its
+  body is read, and so is an upload as soon as it grows past IMAGE_UPLOAD_MAX_SIZE,
+  whatever Content-Length said;
+- the first bytes must be the signature of a JPEG or a PNG, otherwise the rest of the
+  file is skipped;
+- once received, Pillow reads the format and dimensions from the header of the file,
+  without decoding the image, and images of more than IMAGE_UPLOAD_MAX_PIXELS are
+  refused before anything decodes them, such as easy-thumbnails.
+
+The reason an upload was refused is kept in request.upload_error, for the form. The
+fields after a file that is too large are never read, so forms put the CSRF token first.
+"""
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    SkipFile,
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+from PIL import Image as PILImage
+
+# file signatures of the accepted formats
+SIGNATURES = {b"\xff\xd8\xff": "JPEG", b"\x89PNG\r\n\x1a\n": "PNG"}
+# extensions of the saved files, as for the images fetched from a URL
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png"}
+# messages of the reasons an upload is refused
+ERRORS = {
+    "too_large": "The image is too large.",
+    "format": "Upload a JPEG or PNG image.",
+    "dimensions": "The image has too many pixels.",
+}
+FIELD_NAME = "image"
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """ImageUploadHandler streams an uploaded image to disk, and validates it while it
+    is received. The other file fields of the request are ignored.
+    """
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        # the other fields are bounded by DATA_UPLOAD_MAX_MEMORY_SIZE
+        limit = settings.IMAGE_UPLOAD_MAX_SIZE + settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        self.too_large = content_length > limit
+
+    def new_file(self, field_name, *args, **kwargs):
+        self.skip = field_name != FIELD_NAME
+        if self.skip:
+            return
+        if self.too_large:
+            self.refuse("too_large")
+            raise StopUpload(connection_reset=True)
+        super().new_file(field_name, *args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.skip:
+            return None
+        if start + len(raw_data) > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.refuse("too_large")
+            raise StopUpload(connection_reset=True)
+        if start == 0 and not raw_data.startswith(tuple(SIGNATURES)):
+            self.refuse("format")
+            raise SkipFile
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.skip or not hasattr(self, "file"):
+            return None
+        file = super().file_complete(file_size)
+        try:
+            # only reads the header
+            with PILImage.open(file) as image:
+                format = image.format
+                width, height = image.size
+        except (PILImage.UnidentifiedImageError, PILImage.DecompressionBombError):
+            format, width, height = None, 0, 0
+        if format not in EXTENSIONS:
+            self.refuse("format")
+        elif width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+            self.refuse("dimensions")
+        else:
+            file.seek(0)
+            return file
+        self.upload_interrupted()
+        return None
+
+    def refuse(self, code):
+        """refuse keeps the reason an upload was refused, for ImageUploadForm."""
+        self.request.upload_error = code
@@ -15,4 +15,5 @@ urlpatterns = [
     path("like/", views.image_like, name="like"),
     path("", views.image_list, name="list"),
     path("ranking/", views.image_ranking, name="ranking"),
+    path("export/", views.image_export, name="export"),
 ]
@@ -1,28 +1,34 @@
-import redis
-from actions.utils import create_action
-from django.conf import settings
+from account.decorators import alogin_required
+from actions.utils import acreate_action, create_action
+from asgiref.sync import sync_to_async
+from bookmarks.cache import attach_versions, get_versions
+from bookmarks.conditional import conditional, make_etag
+from bookmarks.redis_pool import ar, r
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
-from django.http import HttpResponse, JsonResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
+from django.utils.http import content_disposition_header
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.views.decorators.http import require_POST
 
-from .forms import ImageCreateForm
+from .export import stream_export
+from .forms import ImageCreateForm, ImageUploadForm
 from .models import Image
-
-# connect to Redis
-r = redis.Redis(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    db=settings.REDIS_DB,
-)
+from .recommendations import aget_similar_ids, get_similar_ids, get_similar_images
+from .uploads import ImageUploadHandler
 
 
 # defines views for the images app
 @login_required
+@csrf_exempt
 def image_create(request):
-    """image_create creates a view for authenticated users to store images on the site.
+    """image_create creates a view for authenticated users to store images on the site,
+    either fetched from a URL given by the bookmarklet, or uploaded from their disk.
+    Uploads are streamed to disk by ImageUploadHandler, which must be set before
+    CsrfViewMiddleware reads the request body; the CSRF token is checked by
+    _image_create instead.
 
     Args:
         request (GET): gets the http response to create an instance of the form
@@ -31,28 +37,60 @@ def image_create(request):
     Returns:
         object: Image object is saved to the database
     """
-    if request.method == "POST":
+    request.upload_handlers = [ImageUploadHandler(request)]
+    return _image_create(request)
+
+
+@csrf_protect
+def _image_create(request):
+    if request.method == "POST" and request.content_type == "multipart/form-data":
+        # image uploaded from the disk of the user
+        form = ImageUploadForm(
+            data=request.POST,
+            files=request.FILES,
+            upload_error=getattr(request, "upload_error", None),
+        )
+        if form.is_valid():
+            return ingest_image(request, form.save(commit=False))
+    elif request.method == "POST":
         # form is sent
         form = ImageCreateForm(data=request.POST)
         if form.is_valid():
             # form data is valid
-            cd = form.cleaned_data
-            new_image = form.save(commit=False)
-            # assign current user to the item
-            new_image.user = request.user
-            new_image.save()
-            create_action(request.user, "bookmarked image", new_image)
-            messages.success(request, "Image added successfully!")
-            # redirect to new created item detail view
-            return redirect(new_image.get_absolute_url())
-    else:
+            return ingest_image(request, form.save(commit=False))
+    elif "url" in request.GET:
         # build form with data provided by the bookmarklet via GET
         form = ImageCreateForm(data=request.GET)
+    else:
+        form = ImageUploadForm()
     return render(
         request, "images/image/create.html", {"section": "images", "form": form}
     )
 
 
+def ingest_image(request, image):
+    """ingest_image saves a new image bookmarked by the user, whether it was fetched
+    from a URL or uploaded, and adds it to their activity stream.
+
+    Args:
+        request (POST): the request of the user
+        image (:model:`images.Image`): the unsaved image, with its file saved
+
+    Returns:
+        HttpResponse: redirects to the detail view of the image
+    """
+    # assign current user to the item
+    image.user = request.user
+    if not image.url:
+        # an uploaded image is its own original
+        image.url = request.build_absolute_uri(image.image.url)
+    image.save()
+    create_action(request.user, "bookmarked image", image)
+    messages.success(request, "Image added successfully!")
+    # redirect to new created item detail view
+    return redirect(image.get_absolute_url())
+
+
 def image_detail(request, id, slug):
     """image_detail simple view that displays an image
 
@@ -63,23 +101,94 @@ def image_detail(request, id, slug):
 
     Returns:
         string: url images/image/detail.html
-        dict: section, images, image
+        dict: section, images, image, and similar_images, precomputed by the
+        compute_similar_images management command. The static parts of the page are
+        cached fragments that vary on image_version; the view count and the like state
+        of the user are filled in on every request. The view is counted even when the
+        client already has the page, and gets 304 Not Modified; the view count alone
+        doesn't change the ETag.
     """
     image = get_object_or_404(Image, id=id, slug=slug)
     # increment total image views by 1
     total_views = r.incr(f"image:{image.id}:views")
     # increment image ranking by 1
     r.zincrby("image_ranking", 1, image.id)
-    return render(
+    is_liked = (
+        request.user.is_authenticated
+        and image.users_like.filter(id=request.user.id).exists()
+    )
+    return image_detail_response(
+        request, image, total_views, get_similar_ids(image), is_liked
+    )
+
+
+async def aimage_detail(request, id, slug):
+    """aimage_detail is the async version of image_detail, served under ASGI. Redis is
+    used through its asyncio client and the image through the async ORM, so waiting on
+    them doesn't hold a thread. The page is then built like image_detail's.
+    """
+    image = await aget_object_or_404(Image, id=id, slug=slug)
+    pipeline = ar.pipeline(transaction=False)
+    pipeline.incr(f"image:{image.id}:views")
+    pipeline.zincrby("image_ranking", 1, image.id)
+    total_views, _ = await pipeline.execute()
+    user = await request.auser()
+    is_liked = (
+        user.is_authenticated and await image.users_like.filter(id=user.id).aexists()
+    )
+    similar_ids = await aget_similar_ids(image)
+    return await sync_to_async(image_detail_response)(
+        request, image, total_views, similar_ids, is_liked
+    )
+
+
+def image_detail_response(request, image, total_views, similar_ids, is_liked):
+    """image_detail_response builds the response of image_detail and aimage_detail: 304
+    Not Modified if the client already has the page, the rendered page otherwise.
+
+    Args:
+        request (HttpRequest): the current request
+        image (:model:`images.Image`): the image being viewed
+        total_views (int): views of the image, this one included
+        similar_ids (list): ids of the similar images
+        is_liked (bool): whether the user likes the image
+
+    Returns:
+        HttpResponse: the 304 response or the rendered page
+    """
+    versions = get_versions(
+        ("image", image.id), *(("image", similar_id) for similar_id in similar_ids)
+    )
+    etag = make_etag(
         request,
-        "images/image/detail.html",
-        {
-            "section": "images",
-            "image": image,
-            "total_views": total_views,
-        },
+        "image_detail",
+        image.id,
+        image.total_likes,
+        is_liked,
+        sorted(versions.items()),
     )
 
+    def render_page():
+        similar_images = get_similar_images(image, ids=similar_ids)
+        for similar_image in similar_images:
+            similar_image.cache_version = versions[("image", similar_image.id)]
+        return render(
+            request,
+            "images/image/detail.html",
+            {
+                "section": "images",
+                "image": image,
+                "image_version": versions[("image", image.id)],
+                "total_views": total_views,
+                "is_liked": is_liked,
+                # only evaluated when the image_likes fragment isn't cached
+                "users_like": image.users_like.select_related("profile"),
+                "similar_images": similar_images,
+            },
+        )
+
+    return conditional(request, etag, render_page)
+
 
 @login_required
 @require_POST
@@ -112,12 +221,42 @@ def image_like(request):
     return JsonResponse({"status": "error"})
 
 
+@alogin_required
+@require_POST
+async def aimage_like(request):
+    """aimage_like is the async version of image_like, served under ASGI. It uses the
+    async ORM, so waiting on the database doesn't hold a thread of the server.
+
+    Args:
+        request (POST): the image_id and action parameters
+
+    Returns:
+        Http response : converts given object into JSON
+    """
+    user = await request.auser()
+    image_id = request.POST.get("id")
+    action = request.POST.get("action")
+    if image_id and action:
+        try:
+            image = await Image.objects.aget(id=image_id)
+            if action == "like":
+                await image.users_like.aadd(user)
+                await acreate_action(user, "likes", image)
+            else:
+                await image.users_like.aremove(user)
+            return JsonResponse({"status": "ok"})
+        except Image.DoesNotExist:
+            pass
+    return JsonResponse({"status": "error"})
+
+
 @login_required
 def image_list(request):
     """image_list is a view listing all the bookmarked images on the site. It uses
     JavaScript requests for infinite scroll functionality. This view handles both
     standard and AJAX infinite scroll pagination. A QuerySet is created to retrieve all
-    images in the database, and then the paginator gets 8 images per page.
+    images in the database, and then the paginator gets 8 images per page. Pages that
+    haven't changed since the client fetched them get 304 Not Modified.
 
     Args:
         request (AJAX, GET): requests more images when scrolling to the bottom
@@ -141,16 +280,21 @@ def image_list(request):
             return HttpResponse("")
         # if the page is out of range, return last page of results
         images = paginator.page(paginator.num_pages)
-    if images_only:
-        return render(
-            request,
-            "images/image/list_images.html",
-            {"section": "images", "images": images},
-        )
-    return render(
+    attach_versions(images)
+    template = (
+        "images/image/list_images.html" if images_only else "images/image/list.html"
+    )
+    etag = make_etag(
         request,
-        "images/image/list.html",
-        {"section": "images", "images": images},
+        template,
+        images.number,
+        paginator.num_pages,
+        [(image.id, image.cache_version) for image in images],
+    )
+    return conditional(
+        request,
+        etag,
+        lambda: render(request, template, {"section": "images", "images": images}),
     )
 
 
@@ -179,3 +323,24 @@ def image_ranking(request):
         "images/image/ranking.html",
         {"section": "images", "most_viewed": most_viewed},
     )
+
+
+@login_required
+def image_export(request):
+    """image_export sends a ZIP archive of the images bookmarked by the user, with a
+    manifest.jsonl of their details. The archive is streamed while it is being built,
+    so it is never held in memory.
+
+    Args:
+        request (GET): the user downloading the export
+
+    Returns:
+        StreamingHttpResponse: the ZIP archive, as an attachment
+    """
+    response = StreamingHttpResponse(
+        stream_export(request.user), content_type="application/zip"
+    )
+    response.headers["Content-Disposition"] = content_disposition_header(
+        True, f"{request.user.username}-bookmarks.zip"
+    )
+    return response